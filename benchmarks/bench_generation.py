@@ -0,0 +1,361 @@
+"""
+Benchmark of documentation generation on synthetic test trees.
+
+Measures how building test tree, rendering pages, writing files and
+drawing graph scale with number of tests. For every phase wall time,
+peak of memory allocated during the phase (python 3 only) and number of
+files written are reported. Tracing memory allocations slows python down
+considerably, so each phase is run twice: wall time and written files are
+measured in the first run, memory peak in the second one.
+
+With ``--sphinx-build`` option, source files of synthetic tests are
+written as well, and time of building html documentation with sphinx
+is measured for each layout of autodoc directives (requires sphinx).
+
+Usage::
+
+    python benchmarks/bench_generation.py --tests=1000,10000,100000
+    python benchmarks/bench_generation.py --tests=1000 --sphinx-build
+    python benchmarks/bench_generation.py --tests=10000 --format=html
+"""
+import os
+import sys
+import json
+import shutil
+import subprocess
+import tempfile
+import time
+from optparse import OptionParser
+
+try:
+    import tracemalloc
+except ImportError:  # python 2
+    tracemalloc = None
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+
+from nose_sphinx_doc import SphinxDocPlugin, CollectedTest, TEST_TYPES, \
+    RENDERERS
+
+
+def make_modules(depth, breadth):
+    """
+    Return names of leaf modules of a tree with given depth and breadth.
+    """
+    modules = ['']
+    for level in range(depth):
+        modules = ['{0}{1}mod{2}_{3}'.format(prefix, prefix and '.', level, i)
+                   for prefix in modules for i in range(breadth)]
+    return modules
+
+
+def make_tests(count, depth, breadth, doctest_lines, methods=1):
+    """
+    Return list of synthetic tests spread evenly over leaf modules.
+
+    Tests are created in turn as TestCase, FunctionTestCase and DocTestCase,
+    each doctest has doctest_lines lines. Each TestCase class has given
+    number of test methods (and one test for each of them).
+    """
+    modules = make_modules(depth, breadth)
+    doctest = '\n'.join(
+        ['    Doctest with {0} lines.'.format(doctest_lines), ''] +
+        ['    >>> value = {0}'.format(i) for i in range(doctest_lines - 2)])
+    tests = []
+    for i in range(count):
+        test_type = TEST_TYPES[i % len(TEST_TYPES)]
+        module = modules[i % len(modules)]
+        if test_type == 'TestCase':
+            tests.extend(CollectedTest(module, 'Test{0}'.format(i), test_type,
+                lineno=i, method='test_me_{0}'.format(method))
+                for method in range(methods))
+        elif test_type == 'FunctionTestCase':
+            tests.append(CollectedTest(module, 'test_{0}'.format(i),
+                test_type, lineno=i))
+        else:
+            tests.append(CollectedTest(module, 'func_{0}'.format(i),
+                test_type, lineno=i, source=doctest))
+    return tests
+
+
+def write_sources(tests, dirname):
+    """
+    Write python packages containing given synthetic tests.
+    """
+    modules = {}
+    classes = {}
+    for test_info in tests:
+        if test_info.type == 'TestCase':
+            key = (test_info.module, test_info.name)
+            if key in classes:
+                classes[key].append(test_info.method)
+                continue
+            classes[key] = [test_info.method]
+        modules.setdefault(test_info.module, []).append(test_info)
+    for module, test_infos in modules.items():
+        path = module.split('.')
+        for i in range(len(path)):
+            package = os.path.join(dirname, *path[:i])
+            if not os.path.isdir(package):
+                os.makedirs(package)
+            init = os.path.join(package, '__init__.py')
+            if i and not os.path.exists(init):
+                open(init, 'w').close()
+        lines = ['import unittest\n']
+        for test_info in test_infos:
+            if test_info.type == 'TestCase':
+                lines.append('class {0}(unittest.TestCase):\n'
+                             '    """Test case."""\n'.format(test_info.name))
+                lines.extend('    def {0}(self):\n'
+                             '        """Test method."""\n'.format(method)
+                             for method in classes[(test_info.module,
+                                                    test_info.name)])
+            elif test_info.type == 'FunctionTestCase':
+                lines.append('def {0}():\n'
+                             '    """Test function."""\n'.format(
+                                 test_info.name))
+            else:
+                lines.append('def {0}():\n'
+                             '    """{1}\n    """\n'.format(
+                                 test_info.name, test_info.source.strip()))
+        source = open(os.path.join(dirname, *path) + '.py', 'w')
+        try:
+            source.write(''.join(lines))
+        finally:
+            source.close()
+
+
+def run_sphinx(count, options):
+    """
+    Measure sphinx-build time of documentation of given number of tests,
+    for each layout of autodoc directives.
+
+    :returns:
+        list of results
+    """
+    tests = make_tests(count, options.depth, options.breadth,
+        options.doctest_lines, options.methods)
+    dirname = tempfile.mkdtemp(prefix='nose_sphinx_doc_bench_')
+    results = []
+    try:
+        src_dir = os.path.join(dirname, 'src')
+        write_sources(tests, src_dir)
+        for layout in options.layouts.split(','):
+            plugin = SphinxDocPlugin()
+            plugin.layout = layout
+            doc_dir = os.path.join(dirname, 'doc_' + layout)
+            plugin.genSphinxDoc(plugin.processTests(tests), doc_dir)
+            conf = open(os.path.join(doc_dir, 'conf.py'), 'w')
+            try:
+                conf.write('import sys\n'
+                           'sys.path.insert(0, {0!r})\n'
+                           'extensions = ["sphinx.ext.autodoc"]\n'
+                           'master_doc = "index"\n'.format(src_dir))
+            finally:
+                conf.close()
+            start = time.time()
+            subprocess.check_call([sys.executable, '-m', 'sphinx', '-q',
+                '-b', 'html', doc_dir, os.path.join(dirname, 'html_' + layout)])
+            results.append({
+                'phase': 'sphinx-build ({0})'.format(layout),
+                'wall': time.time() - start,
+                'peak_memory': None,
+                'files_written': None,
+                'tests': count,
+            })
+    finally:
+        shutil.rmtree(dirname)
+    return results
+
+
+class Phase(object):
+    """
+    Measure wall time, memory peak and written files of a phase.
+
+    The phase is run twice, see :py:meth:`measure`, so it has to be
+    repeatable: setup is called before each run to bring files and
+    objects used by the phase to the same state.
+    """
+
+    def __init__(self, name, action, setup=None):
+        """
+        :param name:
+            name of the phase in results
+        :param action:
+            callable running the phase
+        :param setup:
+            optional callable called before each run of action,
+            not measured
+        """
+        self.name = name
+        self.action = action
+        self.setup = setup
+
+    def measure(self, written):
+        """
+        Run the phase without and then with memory tracing.
+
+        :param written:
+            one element list with number of files written so far
+        :returns:
+            dictionary with results
+        """
+        if self.setup is not None:
+            self.setup()
+        written_before = written[0]
+        start = time.time()
+        self.action()
+        wall = time.time() - start
+        files_written = written[0] - written_before
+        peak = None
+        if tracemalloc is not None:
+            if self.setup is not None:
+                self.setup()
+            tracemalloc.start()
+            try:
+                self.action()
+                peak = tracemalloc.get_traced_memory()[1]
+            finally:
+                tracemalloc.stop()
+        return {
+            'phase': self.name,
+            'wall': wall,
+            'peak_memory': peak,
+            'files_written': files_written,
+        }
+
+
+def run(count, options):
+    """
+    Run all phases for given number of tests.
+
+    :returns:
+        list of phase results
+    """
+    tests = make_tests(count, options.depth, options.breadth,
+        options.doctest_lines, options.methods)
+    plugin = SphinxDocPlugin()
+    plugin.workers = options.workers
+    plugin.renderer = RENDERERS[options.format]()
+    written = [0]
+    write_file = plugin._writeFile
+    close_stream = plugin._closeStream
+
+    def counting_write_file(fname, content):
+        result = write_file(fname, content)
+        if result:
+            written[0] += 1
+        return result
+
+    def counting_close_stream(writer, fname):
+        result = close_stream(writer, fname)
+        if result:
+            written[0] += 1
+        return result
+    plugin._writeFile = counting_write_file
+    plugin._closeStream = counting_close_stream
+
+    dirname = tempfile.mkdtemp(prefix='nose_sphinx_doc_bench_')
+    doc_dir = os.path.join(dirname, 'doc')
+    test_dict = plugin.processTests(tests)
+    plugin.countTests(test_dict)
+
+    def build_test_dict():
+        nodes = {}
+        result = {}
+        for test_info in tests:
+            plugin.testToDict(result, test_info, nodes)
+
+    def render():
+        for page in plugin._iterPages(test_dict, doc_dir, []):
+            plugin._render_page(page[0], page[1].modules())
+
+    def remove_doc():
+        if os.path.exists(doc_dir):
+            shutil.rmtree(doc_dir)
+
+    def write_doc():
+        remove_doc()
+        plugin.genSphinxDoc(test_dict, doc_dir)
+
+    def draw_graph():
+        plugin.draw_graph = True
+        try:
+            plugin.genSphinxDoc(test_dict, doc_dir)
+        finally:
+            plugin.draw_graph = False
+
+    phases = [
+        Phase('testToDict', build_test_dict),
+        Phase('processTests', lambda: plugin.processTests(tests)),
+        Phase('countTests', lambda: plugin.countTests(test_dict)),
+        Phase('render', render),
+        Phase('genSphinxDoc', lambda: plugin.genSphinxDoc(test_dict, doc_dir),
+              setup=remove_doc),
+        Phase('genSphinxDoc (unchanged)',
+              lambda: plugin.genSphinxDoc(test_dict, doc_dir),
+              setup=write_doc),
+        Phase('genSphinxDoc (graph)', draw_graph, setup=remove_doc),
+    ]
+    try:
+        return [dict(phase.measure(written), tests=count) for phase in phases]
+    finally:
+        shutil.rmtree(dirname)
+
+
+def main(argv=None):
+    parser = OptionParser(usage='%prog [options]')
+    parser.add_option('--tests', default='1000,10000,100000',
+                      help='comma separated numbers of tests [%default]')
+    parser.add_option('--depth', type='int', default=3,
+                      help='depth of module tree [%default]')
+    parser.add_option('--breadth', type='int', default=10,
+                      help='number of submodules of each module [%default]')
+    parser.add_option('--doctest-lines', type='int', default=20,
+                      help='number of lines of each doctest [%default]')
+    parser.add_option('--methods', type='int', default=1,
+                      help='number of test methods of each TestCase class'
+                           ' [%default]')
+    parser.add_option('--workers', type='int', default=1,
+                      help='number of threads writing pages [%default]')
+    parser.add_option('--format', type='choice', choices=sorted(RENDERERS),
+                      default='rst',
+                      help='format of generated pages [%default]')
+    parser.add_option('--json', action='store_true', default=False,
+                      help='print results as json')
+    parser.add_option('--sphinx-build', action='store_true', default=False,
+                      help='measure time of building html documentation'
+                           ' with sphinx')
+    parser.add_option('--layouts', default='full,grouped',
+                      help='comma separated layouts of autodoc directives'
+                           ' built with --sphinx-build [%default]')
+    options, args = parser.parse_args(argv)
+
+    if options.sphinx_build:
+        try:
+            import sphinx
+        except ImportError:
+            parser.error('--sphinx-build requires sphinx to be installed')
+
+    results = []
+    for count in [int(count) for count in options.tests.split(',')]:
+        results.extend(run(count, options))
+        if options.sphinx_build:
+            results.extend(run_sphinx(count, options))
+
+    if options.json:
+        print(json.dumps(results, indent=1))
+        return
+    print('{0:>8} {1:<26} {2:>10} {3:>12} {4:>8}'.format(
+        'tests', 'phase', 'wall [s]', 'peak [kB]', 'files'))
+    for result in results:
+        peak = result['peak_memory']
+        files = result['files_written']
+        print('{0:>8} {1:<26} {2:>10.3f} {3:>12} {4:>8}'.format(
+            result['tests'], result['phase'], result['wall'],
+            '-' if peak is None else peak // 1024,
+            '-' if files is None else files))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,10 +1,45 @@
 import os
+import sys
+import ast
+import doctest
+import inspect
 import logging
+import multiprocessing
 import unittest
 import errno
+import fnmatch
 import re
+import hashlib
+import json
+import glob
+import shutil
+import tempfile
+import threading
+import time
+import heapq
+from multiprocessing.pool import ThreadPool
+
+try:
+    from html import escape
+except ImportError:  # python 2
+    from cgi import escape
+
+try:
+    import tracemalloc
+except ImportError:  # python 2
+    tracemalloc = None
+
+try:
+    import sqlite3
+except ImportError:  # python built without sqlite
+    sqlite3 = None
 
 import nose
+import nose.case
+import nose.failure
+import nose.plugins.doctests
+import nose.plugins.skip
+import nose.util
 from nose.plugins import Plugin
 
 LOGGER = logging.getLogger(__file__)
@@ -13,384 +48,2881 @@ LOGGER = logging.getLogger(__file__)
     TODO:
         * complete sphinx documentation
         * publish to pypi
-        * test counter (test count in brackets next to  submodule links)
         * tests (unit and functional)
 """
 
+GENERATED_LIST_FILE = '.generated_files'
+"""name of file listing files created by the plugin, other files are never
+removed"""
+SKIPPED_DIRS = ('_build',)
+"""directories never touched when removing stale files (as well as
+directories with names starting with a dot)"""
+SHARD_PAGE = 'tests_{0:03d}'
+"""name of n-th page with tests of a module split into several pages,
+without extension"""
+
+MANIFEST_FILE = '.manifest.json'
+"""name of file storing test cache"""
+MANIFEST_VERSION = 3
+"""version of manifest format, manifests with other version are ignored"""
+
+PROFILE_FILE = 'sphinx_doc_profile.json'
+"""name of file storing profiling report"""
+TEST_TYPES = ('TestCase', 'FunctionTestCase', 'DocTestCase')
+"""types of collected tests, in order used in test counts"""
+NODE_KEYS = ('__tests__', '__counts__', '__slowest__')
+"""keys of entries of test dictionary, which are not submodules"""
+SLOWEST_TESTS = 10
+"""number of tests listed in 'Slowest tests' section of each page"""
+HISTORY_FILE = '{0}.history.sqlite'
+"""name of database with durations of tests, next to output directory"""
+HISTORY_LENGTH = 20
+"""number of recent durations of each test shown in trends"""
+REGRESSION_MIN_DELTA = 0.01
+"""minimal growth of duration (in seconds) reported as regression"""
+SPARK_CHARS = u'\u2581\u2582\u2583\u2584\u2585\u2586\u2587\u2588'
+"""characters of sparklines, from the lowest to the highest"""
+
+
+class CollectedTest(object):
+    """
+    Information about a single test needed to document it.
 
-class SphinxDocPlugin(Plugin):
+    Only plain data is stored here, so that test case instances
+    (with their fixtures and state) can be freed as soon as a test is run.
     """
-    Generate documentation of tests in sphinx rest format.
 
-    Create documentation of tests, in a form of a
-    sphinx .rst file with references to all tests.
+    __slots__ = ('module', 'name', 'type', 'source', 'lineno', 'method', 'doc',
+                 'file', 'status', 'duration')
+
+    def __init__(self, module, name, type, source=None, lineno=None,
+                 method=None, doc=None, file=None, status=None,
+                 duration=None):
+        """
+        :param module:
+            module name
+        :param name:
+            test name (class name for 'TestCase')
+        :param type:
+            either 'DocTestCase', 'FunctionTestCase' or 'TestCase'
+        :param source:
+            doctest text (only for 'DocTestCase')
+        :param lineno:
+            line number of a test in its source file
+        :param method:
+            test method name (only for 'TestCase')
+        :param doc:
+            tuple (signature, docstring, members) used to document test
+            without autodoc, members is a sequence of such tuples
+            with a member name in front; None if not captured
+        :param file:
+            absolute name of source file of the test, if known
+        :param status:
+            result of the test: 'passed', 'failed', 'error' or 'skipped';
+            None if it was not run
+        :param duration:
+            time of running the test in seconds, None if it was not run
+        """
+        self.module = module
+        self.name = name
+        self.type = type
+        self.source = source
+        self.lineno = lineno
+        self.method = method
+        self.doc = doc
+        self.file = file
+        self.status = status
+        self.duration = duration
+
+    def asDict(self):
+        """
+        Return python dictionary with all fields of a test.
+        """
+        return dict((slot, getattr(self, slot)) for slot in self.__slots__)
+
+    @classmethod
+    def fromDict(cls, data):
+        """
+        Create an instance from dictionary returned by :py:meth:`asDict`.
+        """
+        return cls(**dict((str(key), value) for key, value in data.items()))
+
+    def __eq__(self, other):
+        if not isinstance(other, CollectedTest):
+            return NotImplemented
+        return self.asDict() == other.asDict()
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        if result is NotImplemented:
+            return result
+        return not result
+
+    def __repr__(self):
+        return '<CollectedTest {0}.{1} ({2})>'.format(
+            self.module, self.name, self.type)
+
+    def label(self):
+        """
+        Return name of test within its module, including method name.
+        """
+        if self.method:
+            return '{0}.{1}'.format(self.name, self.method)
+        return self.name
+
+    def fullName(self):
+        """
+        Return name of test including module and method names.
+        """
+        return '{0}.{1}'.format(self.module, self.label())
+
+
+class AstCollector(object):
     """
+    Find tests by parsing source files, without importing them.
 
-    name = 'sphinx_doc'
-    """plugin name"""
-    enableOpt = 'sphinx_doc'
-    """default name for ouput file"""
+    Default nose test selection is mimicked, so for most projects the
+    result is the same as when tests are collected by nose. Everything is
+    decided on names only, so a class is recognized as a TestCase if one of
+    its bases is named ``*TestCase`` or is such a class from the same module,
+    and test generators are documented as a single function.
+    """
 
-    #custom methods of SphinxDocPlugin
+    def __init__(self, test_match, ignore_files=(), include=None,
+                 exclude=None, src_dirs=(), include_exe=False,
+                 doctests=False, doctest_tests=False, static_doc=False):
+        """
+        :param test_match:
+            compiled regular expression matching test names
+        :param ignore_files:
+            list of compiled regular expressions matching ignored files
+        :param include:
+            list of compiled regular expressions or None
+        :param exclude:
+            list of compiled regular expressions or None
+        :param src_dirs:
+            names of non-package directories searched for tests
+        :param include_exe:
+            look for tests in executable files
+        :param doctests:
+            collect doctests
+        :param doctest_tests:
+            collect doctests in test modules too
+        :param static_doc:
+            store docstrings and signatures of tests in
+            :py:attr:`CollectedTest.doc`
+        """
+        self.test_match = test_match
+        self.ignore_files = ignore_files
+        self.include = include
+        self.exclude = exclude
+        self.src_dirs = src_dirs
+        self.include_exe = include_exe
+        self.doctests = doctests
+        self.doctest_tests = doctest_tests
+        self.static_doc = static_doc
+        self.doctest_parser = doctest.DocTestParser()
+
+    @classmethod
+    def fromConfig(cls, conf, static_doc=False):
+        """
+        Create collector using selection rules from nose configuration.
+
+        :param conf:
+            an instance of :py:class:`nose.config.Config`
+        :param static_doc:
+            see :py:meth:`__init__`
+        """
+        return cls(conf.testMatch, ignore_files=conf.ignoreFiles,
+            include=conf.include, exclude=conf.exclude,
+            src_dirs=conf.srcDirs, include_exe=conf.includeExe,
+            doctests=getattr(conf.options, 'enable_plugin_doctest', False),
+            doctest_tests=getattr(conf.options, 'doctest_tests', False),
+            static_doc=static_doc)
+
+    def matches(self, name):
+        """
+        Check if name matches testMatch or include, and not exclude.
+        """
+        return bool(
+            (self.test_match.search(name) or
+             (self.include and [inc for inc in self.include
+                                if inc.search(name)])) and
+            not (self.exclude and [exc for exc in self.exclude
+                                   if exc.search(name)]))
+
+    def _wantDirectory(self, dirname):
+        """
+        Check if tests should be searched for in a directory.
+        """
+        tail = os.path.basename(dirname)
+        if tail.startswith(('.', '_')):
+            return False
+        if nose.util.ispackage(dirname):
+            return not (self.exclude and [exc for exc in self.exclude
+                                          if exc.search(tail)])
+        return self.matches(tail) or tail in (self.src_dirs or ())
+
+    def _wantFile(self, fname):
+        """
+        Check if a file should be parsed.
+
+        :returns:
+            tuple (wanted, is test module)
+        """
+        base = os.path.basename(fname)
+        if (not base.endswith('.py') or
+                [ignore for ignore in self.ignore_files if ignore.search(base)]
+                or (not self.include_exe and nose.util.is_executable(fname))):
+            return False, False
+        is_test = self.matches(base)
+        return is_test or self.doctests, is_test
+
+    def iterFiles(self, path):
+        """
+        Iterate over python files that should be parsed.
+
+        :param path:
+            file or directory name
+        :returns:
+            iterator over tuples (file name, is test module)
+        """
+        path = os.path.abspath(path)
+        if os.path.isfile(path):
+            yield path, True
+            return
+        stack = [path]
+        while stack:
+            dirname = stack.pop()
+            init_name = os.path.join(dirname, '__init__.py')
+            if os.path.isfile(init_name):
+                is_test = self.matches(os.path.basename(dirname))
+                if is_test or self.doctests:
+                    yield init_name, is_test
+            subdirs = []
+            for entry in sorted(os.listdir(dirname)):
+                entry_path = os.path.join(dirname, entry)
+                if os.path.isdir(entry_path):
+                    if self._wantDirectory(entry_path):
+                        subdirs.append(entry_path)
+                else:
+                    wanted, is_test = self._wantFile(entry_path)
+                    if wanted:
+                        yield entry_path, is_test
+            stack.extend(reversed(subdirs))
+
+    def collectFile(self, fname, is_test=True):
+        """
+        Find tests in a python file.
+
+        :param fname:
+            file name
+        :param is_test:
+            look for test classes and functions, not only for doctests
+        :returns:
+            list of :py:class:`CollectedTest` instances
+        """
+        module_name = nose.util.getpackage(fname)
+        source_file = open(fname, 'rb')
+        try:
+            tree = ast.parse(source_file.read(), fname)
+        except SyntaxError as exc:
+            LOGGER.warning('cannot parse %s: %s', fname, exc)
+            return []
+        finally:
+            source_file.close()
+        tests = []
+        if is_test:
+            tests.extend(self._testCases(tree, module_name))
+        if self.doctests and (self.doctest_tests or
+                              not self.test_match.search(module_name)):
+            tests.extend(self._docTests(tree, module_name))
+        fname = os.path.abspath(fname)
+        for test_info in tests:
+            test_info.file = fname
+        return tests
+
+    @classmethod
+    def _first_line(cls, node):
+        """
+        Return first line of a definition, including its decorators.
+        """
+        return min([node.lineno] +
+                   [decorator.lineno for decorator in node.decorator_list])
+
+    @classmethod
+    def _declared(cls, node):
+        """
+        Return value of ``__test__`` attribute set in class body, or None.
+        """
+        for item in node.body:
+            if isinstance(item, ast.Assign) and [
+                    target for target in item.targets
+                    if getattr(target, 'id', None) == '__test__']:
+                try:
+                    return bool(ast.literal_eval(item.value))
+                except ValueError:
+                    return None
+        return None
+
+    @classmethod
+    def _signature(cls, node, bound=False):
+        """
+        Return signature of a function definition, like ``(a, b=1)``.
+
+        :param node:
+            function definition
+        :param bound:
+            skip first argument (self or cls)
+        """
+        args = node.args
+        positional = list(getattr(args, 'posonlyargs', [])) + list(args.args)
+        defaults = [None] * (len(positional) - len(args.defaults)) + \
+            list(args.defaults)
+        params = []
+        for arg, default in zip(positional, defaults):
+            param = getattr(arg, 'arg', getattr(arg, 'id', None))
+            if default is not None:
+                param += '=' + cls._expression(default)
+            params.append(param)
+        if bound:
+            params = params[1:]
+        if args.vararg:
+            params.append('*' + getattr(args.vararg, 'arg', args.vararg))
+        elif getattr(args, 'kwonlyargs', None):
+            params.append('*')
+        for arg, default in zip(getattr(args, 'kwonlyargs', []),
+                                getattr(args, 'kw_defaults', [])):
+            param = arg.arg
+            if default is not None:
+                param += '=' + cls._expression(default)
+            params.append(param)
+        if args.kwarg:
+            params.append('**' + getattr(args.kwarg, 'arg', args.kwarg))
+        return '({0})'.format(', '.join(params))
+
+    @classmethod
+    def _expression(cls, node):
+        """
+        Return source of an expression, or ``...`` if it cannot be recreated.
+        """
+        unparse = getattr(ast, 'unparse', None)
+        if unparse is not None:
+            return unparse(node)
+        try:
+            return repr(ast.literal_eval(node))
+        except ValueError:
+            return '...'
+
+    def _staticDoc(self, node):
+        """
+        Return :py:attr:`CollectedTest.doc` for a class or function definition.
+        """
+        if isinstance(node, ast.FunctionDef):
+            return (self._signature(node), ast.get_docstring(node), ())
+        members = []
+        for item in node.body:
+            if (isinstance(item, ast.FunctionDef) and
+                    not item.name.startswith('_')):
+                docstring = ast.get_docstring(item)
+                if docstring:
+                    decorators = [getattr(decorator, 'id', None)
+                                  for decorator in item.decorator_list]
+                    members.append((item.name, self._signature(item,
+                        bound='staticmethod' not in decorators), docstring))
+        members.sort()
+        return (None, ast.get_docstring(node), tuple(members))
+
+    @classmethod
+    def _classMethods(cls, node, defined):
+        """
+        Return methods of a class, including methods inherited from
+        classes defined in the same module.
+
+        Bases are searched depth first, from left to right, which is
+        the method resolution order unless a base is shared.
+        Methods inherited from classes imported from other modules
+        are not known.
+
+        :param node:
+            class definition
+        :param defined:
+            dictionary of class definitions preceding node, by name
+        :returns:
+            dictionary mapping method names to their definitions
+        """
+        methods = {}
+        seen = set()
+        stack = [node]
+        while stack:
+            current = stack.pop()
+            if id(current) in seen:
+                continue
+            seen.add(id(current))
+            for item in current.body:
+                if isinstance(item, ast.FunctionDef):
+                    methods.setdefault(item.name, item)
+            stack.extend(defined[base.id] for base in reversed(current.bases)
+                         if isinstance(base, ast.Name) and base.id in defined)
+        return methods
+
+    def _testCases(self, tree, module_name):
+        """
+        Find test classes and test functions in module tree.
+        """
+        test_case_names = set(['TestCase'])
+        defined = {}
+        classes = []
+        functions = []
+        for node in tree.body:
+            if isinstance(node, ast.ClassDef):
+                base_names = [getattr(base, 'id', getattr(base, 'attr', ''))
+                              for base in node.bases]
+                is_test_case = [name for name in base_names
+                                if name in test_case_names or
+                                name.endswith('TestCase')]
+                if is_test_case:
+                    test_case_names.add(node.name)
+                wanted = self._declared(node)
+                if wanted is None:
+                    wanted = (not node.name.startswith('_') and
+                              (is_test_case or self.matches(node.name)))
+                if wanted:
+                    classes.append((node, self._classMethods(node, defined)))
+                defined[node.name] = node
+            elif isinstance(node, ast.FunctionDef):
+                if not node.name.startswith('_') and self.matches(node.name):
+                    functions.append(node)
+        classes.sort(key=lambda item: item[0].name)
+        functions.sort(key=self._first_line)
+
+        tests = []
+        for node, methods in classes:
+            names = sorted(name for name in methods
+                           if not name.startswith('_') and self.matches(name))
+            if not names and 'runTest' in methods:
+                names = ['runTest']
+            doc = self.static_doc and self._staticDoc(node) or None
+            for name in names:
+                tests.append(CollectedTest(module_name, node.name, 'TestCase',
+                    lineno=self._first_line(methods[name]), method=name,
+                    doc=doc))
+        for node in functions:
+            tests.append(CollectedTest(module_name, node.name,
+                'FunctionTestCase', lineno=self._first_line(node),
+                doc=self.static_doc and self._staticDoc(node) or None))
+        return tests
+
+    def _docTests(self, tree, module_name):
+        """
+        Find docstrings containing doctests in module tree.
+        """
+        found = []
+        stack = [(tree, None)]
+        while stack:
+            node, name = stack.pop()
+            docstring = ast.get_docstring(node, clean=False)
+            if docstring and self.doctest_parser.get_examples(docstring):
+                if name is None:
+                    full_name, lineno = module_name, 1
+                else:
+                    full_name = '{0}.{1}'.format(module_name, name)
+                    lineno = self._first_line(node)
+                    if isinstance(node, ast.ClassDef):
+                        lineno = node.lineno
+                found.append((full_name, lineno, docstring))
+            if name is None or isinstance(node, ast.ClassDef):
+                for item in node.body:
+                    if isinstance(item, (ast.ClassDef, ast.FunctionDef)):
+                        if name is None:
+                            stack.append((item, item.name))
+                        else:
+                            stack.append((item,
+                                '{0}.{1}'.format(name, item.name)))
+        found.sort()
+        return [CollectedTest(module_name,
+                    full_name.replace(module_name + '.', '', 1),
+                    'DocTestCase', source=docstring, lineno=lineno)
+                for full_name, lineno, docstring in found]
+
+
+class ModulePath(object):
+    """
+    Path of a page in the tree of tests, as a link to path of its parent.
+
+    Pages of submodules share path of their parent instead of copying it,
+    so walking a tree takes time and memory linear in its size, however deep
+    it is. Module names and directory of a page are built only when the page
+    is written.
+    """
+
+    __slots__ = ('parent', 'name', 'start', 'base')
+
+    def __init__(self, parent, name, start=(), base=''):
+        """
+        :param parent:
+            path of parent module, None for the module where walk starts
+        :param name:
+            module name, None for the module where walk starts
+        :param start:
+            list of module names of the module where walk starts
+        :param base:
+            output directory of the module where walk starts
+        """
+        self.parent = parent
+        self.name = name
+        self.start = start
+        self.base = base
+
+    def _names(self):
+        """
+        Return path where walk started and names of modules below it.
+        """
+        names = []
+        node = self
+        while node.parent is not None:
+            names.append(node.name)
+            node = node.parent
+        names.reverse()
+        return node, names
+
+    def modules(self):
+        """
+        Return list of module names.
+        """
+        root, names = self._names()
+        return list(root.start) + names
+
+    def dirname(self):
+        """
+        Return output directory of the page.
+        """
+        root, names = self._names()
+        return os.path.join(root.base, *names)
+
+
+def _collect_file(args):
+    """
+    Call :py:meth:`AstCollector.collectFile` with tuple of arguments.
+
+    Used with multiprocessing pool, which needs a module level function.
+    """
+    collector, fname, is_test = args
+    return collector.collectFile(fname, is_test)
+
+
+class Profiler(object):
+    """
+    Measure time and memory used by phases of documentation generation.
+
+    Plugin methods are wrapped by :py:meth:`timed`, so nothing is measured
+    (and nothing is slowed down) unless profiling is enabled.
+    Times of methods called from several threads are summed.
+    """
+
+    def __init__(self, slowest_count=10, trace_memory=False):
+        """
+        :param slowest_count:
+            number of slowest modules to report
+        :param trace_memory:
+            if True, memory peaks are measured too, tracing slows down
+            the whole run, so measured times are not comparable with
+            runs without it
+        """
+        self.slowest_count = slowest_count
+        self.trace_memory = trace_memory
+        self.phases = {}  # phase name -> total time
+        self.calls = {}  # phase name -> number of calls
+        self.counters = {}
+        self.memory_peaks = {}
+        self.slowest = []  # heap of (time, module name)
+        self.lock = threading.Lock()
+
+    def add(self, phase, seconds, key=None):
+        """
+        Add time spent in a phase.
+
+        :param phase:
+            phase name
+        :param seconds:
+            time spent
+        :param key:
+            optional name of processed module, used to find slowest ones
+        """
+        with self.lock:
+            self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+            self.calls[phase] = self.calls.get(phase, 0) + 1
+            if key is not None:
+                if len(self.slowest) < self.slowest_count:
+                    heapq.heappush(self.slowest, (seconds, key))
+                else:
+                    heapq.heappushpop(self.slowest, (seconds, key))
+
+    def count(self, name, value=1):
+        """
+        Increase a counter.
+        """
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def timed(self, phase, func, key=None):
+        """
+        Return function measuring time of each call to func.
+
+        :param phase:
+            phase name
+        :param func:
+            measured function
+        :param key:
+            optional function returning module name from func arguments
+        """
+        def wrapper(*args, **kwargs):
+            start = time.time()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.add(phase, time.time() - start,
+                    key and key(*args, **kwargs))
+        return wrapper
+
+    def countWrites(self, write_file):
+        """
+        Return wrapper of :py:meth:`SphinxDocPlugin._writeFile` counting
+        written and unchanged files and written bytes.
+        """
+        def wrapper(fname, content):
+            written = write_file(fname, content)
+            if written:
+                self.count('files_written')
+                if not isinstance(content, bytes):
+                    content = content.encode('utf-8')
+                self.count('bytes_written', len(content))
+            else:
+                self.count('files_unchanged')
+            return written
+        return wrapper
+
+    def countStreams(self, close_stream):
+        """
+        Return wrapper of :py:meth:`SphinxDocPlugin._closeStream` counting
+        streamed files the same way as :py:meth:`countWrites`.
+        """
+        def wrapper(writer, fname):
+            written = close_stream(writer, fname)
+            if written:
+                self.count('files_written')
+                self.count('bytes_written', writer.size)
+            else:
+                self.count('files_unchanged')
+            return written
+        return wrapper
+
+    def startMemory(self):
+        """
+        Start tracing memory allocations (python 3 only), if enabled.
+        """
+        if (self.trace_memory and tracemalloc is not None and
+                not tracemalloc.is_tracing()):
+            tracemalloc.start()
+
+    def memoryPeak(self, name):
+        """
+        Store memory peak since tracing started or since last call.
+
+        :param name:
+            name of finished phase
+        """
+        if tracemalloc is None or not tracemalloc.is_tracing():
+            return
+        self.memory_peaks[name] = tracemalloc.get_traced_memory()[1]
+        if hasattr(tracemalloc, 'reset_peak'):
+            tracemalloc.reset_peak()
+
+    def stopMemory(self):
+        """
+        Stop tracing memory allocations.
+        """
+        if tracemalloc is not None and tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+    def report(self):
+        """
+        Return profiling results as python dictionary.
+        """
+        return {
+            'version': 1,
+            'phases': self.phases,
+            'calls': self.calls,
+            'counters': self.counters,
+            'memory_traced': self.trace_memory,
+            'memory_peaks': self.memory_peaks,
+            'slowest_modules': [{'module': key, 'time': seconds}
+                                for seconds, key in sorted(self.slowest,
+                                                           reverse=True)],
+        }
+
+
+class StreamWriter(object):
+    """
+    Base class of writers streaming information about tests to a file.
+
+    Modules are added one by one in the order of page traversal
+    (parents before their submodules), so the output is created in the same
+    walk that writes pages, without building it in memory.
+    """
+
+    def __init__(self, outfile):
+        """
+        :param outfile:
+            file object opened for writing in binary mode
+        """
+        self.outfile = outfile
+        self.md5 = hashlib.md5()
+        self.size = 0  # number of written bytes
+
+    def _write(self, text):
+        data = text.encode('utf-8')
+        self.md5.update(data)
+        self.size += len(data)
+        self.outfile.write(data)
+
+    def addModule(self, test_dict, module_path):
+        """
+        Write information about a module and its tests.
+
+        :param test_dict:
+            part of test dictionary for given module
+        :param module_path:
+            list of module names
+        """
+        raise NotImplementedError
+
+    def close(self):
+        """
+        Close the file.
+
+        :returns:
+            md5 hex digest of written content
+        """
+        self.outfile.close()
+        return self.md5.hexdigest()
+
+
+class JsonWriter(StreamWriter):
+    """
+    Stream inventory of tests in json lines format, one test per line.
+    """
+
+    def addModule(self, test_dict, module_path):
+        """
+        Write records of tests of a module.
+
+        :param test_dict:
+            part of test dictionary for given module
+        :param module_path:
+            list of module names
+        """
+        self._write(''.join(json.dumps({
+            'module': test_info.module,
+            'name': test_info.name,
+            'method': test_info.method,
+            'type': test_info.type,
+            'file': test_info.file,
+            'line': test_info.lineno,
+        }, sort_keys=True) + '\n'
+            for test_info in test_dict.get('__tests__', ())))
+
+
+class DotWriter(StreamWriter):
+    """
+    Stream graph of tests in graphviz dot format to a file.
+    """
+
+    def __init__(self, outfile):
+        super(DotWriter, self).__init__(outfile)
+        self._write('graph {\n    label="Tests";\n')
+
+    def addModule(self, test_dict, module_path):
+        """
+        Write nodes and edges of a module and of its tests.
+
+        :param test_dict:
+            part of test dictionary for given module
+        :param module_path:
+            list of module names
+        """
+        self._write(''.join(self.moduleLines(test_dict, module_path)))
+
+    @classmethod
+    def moduleLines(cls, test_dict, module_path, with_module=True):
+        """
+        Return lines with nodes and edges of a module and of its tests.
+
+        Module is connected to its parent module, unless it is a top-level one.
+
+        :param test_dict:
+            part of test dictionary for given module
+        :param module_path:
+            list of module names
+        :param with_module:
+            if False, only tests are drawn (module node is drawn elsewhere)
+        """
+        module_name = '.'.join(module_path)
+        lines = []
+        if module_path and with_module:
+            lines.append('        "{0}" [label="{1}"];\n'.format(
+                module_name, module_path[-1]))
+            if len(module_path) > 1:
+                lines.append('        "{0}" -- "{1}";\n'.format(
+                    module_name[:-len(module_path[-1]) - 1], module_name))
+        for test in test_dict.get('__tests__', ()):
+            lines.append('        "{0}.{1}" [label="{1}"];\n'.format(
+                module_name, test.name))
+            lines.append('        "{0}" -- "{0}.{1}";\n'.format(
+                module_name, test.name))
+        return lines
+
+    @classmethod
+    def summaryLines(cls, node_id, label, module_path):
+        """
+        Return lines with a box node standing for a collapsed subtree.
+
+        :param node_id:
+            id of summary node
+        :param label:
+            text of summary node
+        :param module_path:
+            list of module names of parent module
+        """
+        lines = ['        "{0}" [label="{1}", shape=box];\n'.format(
+            node_id, label)]
+        if module_path:
+            lines.append('        "{0}" -- "{1}";\n'.format(
+                '.'.join(module_path), node_id))
+        return lines
+
+    def close(self):
+        """
+        Finish the graph and close the file.
+
+        :returns:
+            md5 hex digest of written content
+        """
+        self._write('}\n')
+        return super(DotWriter, self).close()
+
+
+class Renderer(object):
+    """
+    Base class of markup of generated pages.
+
+    The plugin decides what is documented on each page, renderers decide
+    how it is written. Headings and titles of entries are passed as plain
+    text, paragraphs and table cells as markup built with :py:meth:`literal`
+    and :py:meth:`strong`.
+    """
+
+    extension = None
+    """extension of page files"""
+
+    def page(self, title, body):
+        """
+        Return complete text of a page file.
+
+        :param title:
+            title of the page
+        :param body:
+            rendered content of the page
+        """
+        return body
+
+    def heading(self, text, section_char):
+        """
+        Return heading of a page (section_char '=') or of a section ('-').
+        """
+        raise NotImplementedError
+
+    def paragraph(self, text):
+        """
+        Return paragraph with given markup.
+        """
+        raise NotImplementedError
+
+    def literal(self, text):
+        """
+        Return markup of literal text, like names of tests.
+        """
+        raise NotImplementedError
 
-    def storeTest(self, test):
+    def strong(self, text):
+        """
+        Return markup of emphasized text.
+        """
+        return '**{0}**'.format(text)
+
+    def toc(self, entries):
+        """
+        Return table of contents linking other pages.
+
+        :param entries:
+            list of (title, page) tuples, page is relative name
+            of a page file without extension
+        :returns:
+            empty string if there are no entries
+        """
+        raise NotImplementedError
+
+    def autodoc(self, directive, name, options=()):
+        """
+        Return sphinx directive documenting a test imported by sphinx.
+
+        :param directive:
+            'autoclass', 'autofunction' or 'currentmodule'
+        :param name:
+            name of documented object
+        :param options:
+            directive options, like ':members:'
+        """
+        raise NotImplementedError
+
+    def staticDoc(self, directive, name, signature, docstring, members):
+        """
+        Return documentation of a test from its captured docstrings.
+
+        :param directive:
+            either 'class' or 'function'
+        :param name:
+            full name of the test
+        :param signature:
+            signature of the test or None
+        :param docstring:
+            docstring of the test or None
+        :param members:
+            list of (name, signature, docstring) tuples of test methods
+        """
+        raise NotImplementedError
+
+    def codeBlock(self, title, lines, language):
+        """
+        Return block of source code with a title.
+
+        :param title:
+            text describing the code
+        :param lines:
+            lines of code without common indentation
+        :param language:
+            language used for highlighting
+        """
+        raise NotImplementedError
+
+    def table(self, header, rows):
+        """
+        Return table with a header row.
+
+        :param header:
+            list of column titles
+        :param rows:
+            list of rows, each one a list of cell markups
+        """
+        raise NotImplementedError
+
+    def graph(self, fname):
+        """
+        Return graph drawn from a graphviz dot file.
+        """
+        raise NotImplementedError
+
+
+class RstRenderer(Renderer):
+    """
+    Write pages in reStructuredText with sphinx directives.
+    """
+
+    extension = '.rst'
+
+    @classmethod
+    def _indent(cls, text, indent):
+        """
+        Indent all non-empty lines of text.
+
+        :param text:
+            text or None
+        :param indent:
+            number of spaces
+        :returns:
+            list of lines, each ending with new line character
+        """
+        if not text:
+            return []
+        return [(' ' * indent + line).rstrip() + '\n'
+                for line in text.split('\n')]
+
+    def heading(self, text, section_char):
+        return '{0}\n{1}\n{0}\n'.format(section_char * len(text), text)
+
+    def paragraph(self, text):
+        return '    {0}\n\n'.format(text)
+
+    def literal(self, text):
+        return '``{0}``'.format(text)
+
+    def toc(self, entries):
+        if not entries:
+            return ''
+        lines = ['.. toctree::\n', '    :maxdepth: 1\n', '\n']
+        lines.extend('    {0}<{1}>\n'.format(title, page)
+                     for title, page in entries)
+        lines.append('\n')
+        return ''.join(lines)
+
+    def autodoc(self, directive, name, options=()):
+        lines = ['{0}.. {1}:: {2}\n'.format(' ' * 4, directive, name)]
+        lines.extend('{0}{1}\n'.format(' ' * 8, option) for option in options)
+        lines.append('\n')
+        return ''.join(lines)
+
+    def staticDoc(self, directive, name, signature, docstring, members):
+        lines = ['{0}.. py:{1}:: {2}{3}\n\n'.format(' ' * 4, directive,
+            name, signature or '')]
+        lines.extend(self._indent(docstring, 8))
+        if docstring:
+            lines.append('\n')
+        for member, signature, docstring in members:
+            lines.append('{0}.. py:method:: {1}{2}\n\n'.format(
+                ' ' * 8, member, signature or ''))
+            lines.extend(self._indent(docstring, 12))
+            lines.append('\n')
+        return ''.join(lines)
+
+    def codeBlock(self, title, lines, language):
+        indent = '\n' + ' ' * 12
+        return ''.join([
+            '{0}{1}\n{2}.. code-block:: {3}\n'.format(' ' * 4, title,
+                ' ' * 8, language),
+            #content of directive has to be separated by an empty line
+            '\n' if lines and lines[0] else '',
+            indent[1:], indent.join(lines), '\n',
+            ' ' * 8 + '\n'])
+
+    def table(self, header, rows):
+        lines = ['.. list-table::\n',
+                 '    :header-rows: 1\n',
+                 '\n']
+        for row in [header] + rows:
+            lines.append(u'    * - {0}\n'.format(row[0]))
+            lines.extend(u'      - {0}\n'.format(cell) for cell in row[1:])
+        lines.append('\n')
+        return ''.join(lines)
+
+    def graph(self, fname):
+        return '.. graphviz:: {0}\n'.format(fname)
+
+
+class MystRenderer(Renderer):
+    """
+    Write pages in MyST markdown, for sphinx with myst-parser extension.
+    """
+
+    extension = '.md'
+
+    def heading(self, text, section_char):
+        return '{0} {1}\n\n'.format('#' if section_char == '=' else '##',
+                                    text)
+
+    def paragraph(self, text):
+        return '{0}\n\n'.format(text)
+
+    def literal(self, text):
+        return '`{0}`'.format(text)
+
+    def _directive(self, name, argument, lines=()):
+        """
+        Return fenced MyST directive.
+        """
+        lines = ['```{{{0}}}{1}'.format(name, argument and ' ' + argument)
+                 ] + list(lines) + ['```', '', '']
+        return '\n'.join(lines)
+
+    def toc(self, entries):
+        if not entries:
+            return ''
+        return self._directive('toctree', '', [':maxdepth: 1', ''] + [
+            '{0}<{1}>'.format(title, page) for title, page in entries])
+
+    def autodoc(self, directive, name, options=()):
+        return self._directive(directive, name, options)
+
+    def staticDoc(self, directive, name, signature, docstring, members):
+        #docstrings are written in reStructuredText
+        return self._directive('eval-rst', '', [RstRenderer().staticDoc(
+            directive, name, signature, docstring, members).rstrip('\n')])
+
+    def codeBlock(self, title, lines, language):
+        return '{0}\n\n```{1}\n{2}\n```\n\n'.format(title, language,
+            '\n'.join(lines))
+
+    def table(self, header, rows):
+        lines = [':header-rows: 1', '']
+        for row in [header] + rows:
+            lines.append(u'* - {0}'.format(row[0]))
+            lines.extend(u'  - {0}'.format(cell) for cell in row[1:])
+        return self._directive('list-table', '', lines)
+
+    def graph(self, fname):
+        return self._directive('graphviz', fname)
+
+
+class HtmlRenderer(Renderer):
+    """
+    Write static html pages, which are browsable without running sphinx.
+
+    Tests can not be imported by autodoc, so classes and functions are
+    listed by their names, with docstrings when they have been captured.
+    """
+
+    extension = '.html'
+
+    def page(self, title, body):
+        return (u'<!DOCTYPE html>\n<html>\n<head>\n<meta charset="utf-8">\n'
+                u'<title>{0}</title>\n</head>\n<body>\n{1}</body>\n'
+                u'</html>\n'.format(escape(title), body))
+
+    def heading(self, text, section_char):
+        tag = 'h1' if section_char == '=' else 'h2'
+        return '<{0}>{1}</{0}>\n'.format(tag, escape(text))
+
+    def paragraph(self, text):
+        return '<p>{0}</p>\n'.format(text)
+
+    def literal(self, text):
+        return '<code>{0}</code>'.format(escape(text))
+
+    def strong(self, text):
+        return '<strong>{0}</strong>'.format(text)
+
+    def toc(self, entries):
+        if not entries:
+            return ''
+        lines = ['<ul>\n']
+        lines.extend('<li><a href="{0}{1}">{2}</a></li>\n'.format(
+            escape(page), self.extension, escape(title))
+            for title, page in entries)
+        lines.append('</ul>\n')
+        return ''.join(lines)
+
+    def autodoc(self, directive, name, options=()):
+        if directive == 'currentmodule':
+            return ''
+        return '<dl class="{0}">\n<dt>{1}</dt>\n</dl>\n'.format(
+            directive[len('auto'):], self.literal(name))
+
+    def _docstring(self, docstring):
+        """
+        Return docstring as preformatted text.
+        """
+        if not docstring:
+            return ''
+        return '<pre>{0}</pre>\n'.format(escape(docstring))
+
+    def staticDoc(self, directive, name, signature, docstring, members):
+        lines = ['<dl class="{0}">\n<dt>{1}</dt>\n<dd>\n'.format(directive,
+            self.literal(name + (signature or ''))),
+            self._docstring(docstring)]
+        for member, signature, docstring in members:
+            lines.append('<dl class="method">\n<dt>{0}</dt>\n<dd>\n{1}'
+                         '</dd>\n</dl>\n'.format(
+                             self.literal(member + (signature or '')),
+                             self._docstring(docstring)))
+        lines.append('</dd>\n</dl>\n')
+        return ''.join(lines)
+
+    def codeBlock(self, title, lines, language):
+        return '<p>{0}</p>\n<pre class="{1}">{2}</pre>\n'.format(
+            escape(title), language, escape('\n'.join(lines)))
+
+    def table(self, header, rows):
+        lines = ['<table>\n<thead>\n<tr>']
+        lines.extend('<th>{0}</th>'.format(escape(title)) for title in header)
+        lines.append('</tr>\n</thead>\n<tbody>\n')
+        for row in rows:
+            lines.append('<tr>')
+            lines.extend(u'<td>{0}</td>'.format(cell) for cell in row)
+            lines.append('</tr>\n')
+        lines.append('</tbody>\n</table>\n')
+        return ''.join(lines)
+
+    def graph(self, fname):
+        return '<p><a href="{0}">{0}</a></p>\n'.format(escape(fname))
+
+
+RENDERERS = {
+    'rst': RstRenderer,
+    'myst': MystRenderer,
+    'html': HtmlRenderer,
+}
+"""renderers of output formats, by names used in sphinx_doc_format option"""
+
+
+class SphinxDocPlugin(Plugin):
+    """
+    Generate documentation of tests in sphinx rest format.
+
+    Create documentation of tests, in a form of a
+    sphinx .rst file with references to all tests.
+    """
+
+    name = 'sphinx_doc'
+    """plugin name"""
+    enableOpt = 'sphinx_doc'
+    """default name for ouput file"""
+
+    #custom methods of SphinxDocPlugin
+
+    def storeTest(self, test, spool=True):
+        """
+        Add information about a test to self.test_dict.
+
+        Only an instance of :py:class:`CollectedTest` is stored,
+        no reference to the test itself is kept.
+
+        :param test:
+            an instance of :py:class:`nose.case.Test`
+        :param spool:
+            in worker process, spool test immediately; if False,
+            caller has to spool it later
+        :returns:
+            stored instance of :py:class:`CollectedTest`, or None if
+            the test is excluded by filters
+        """
+        test_info = self.extractTestInfo(test)
+        if test_info is None:
+            return None
+        if not self.is_worker:
+            self.testToDict(self.test_dict, test_info, self.test_nodes)
+        elif spool:
+            self._spoolTest(test_info)
+        return test_info
+
+    def collectTests(self, test):
+        """
+        Store all tests contained in a test suite, without running them.
+
+        Iterating over a suite makes nose loader import test modules
+        and select tests, but no fixtures are run.
+        Failures (for example import errors) are logged and skipped.
+
+        :param test:
+            test suite or an instance of :py:class:`nose.case.Test`
+        """
+        stack = [test]
+        while stack:
+            current = stack.pop()
+            if isinstance(current, nose.case.Test):
+                if isinstance(current.test, nose.failure.Failure):
+                    LOGGER.warning('skipping failed test: %s', current)
+                else:
+                    self.storeTest(current)
+            else:
+                stack.extend(reversed(list(current)))
+
+    def _discoveryPaths(self):
+        """
+        Return list of paths to search for tests with ast discovery.
+
+        Test names given in command line may be file or directory names,
+        or names of modules relative to working directory.
+        """
+        names = (self.test_names or self.conf.testNames or
+                 [self.conf.workingDir])
+        paths = []
+        for name in names:
+            path = os.path.join(self.conf.workingDir, name)
+            module_path = os.path.join(self.conf.workingDir,
+                *name.split(':')[0].split('.'))
+            for candidate in (path, module_path + '.py', module_path):
+                if os.path.exists(candidate):
+                    paths.append(candidate)
+                    break
+            else:
+                LOGGER.warning('cannot find tests for %s', name)
+        return paths
+
+    def discoverTests(self):
+        """
+        Store tests found by :py:class:`AstCollector`, without importing them.
+
+        Files are parsed in :py:attr:`workers` processes.
+        """
+        collector = AstCollector.fromConfig(self.conf, self.static_doc)
+        jobs = []
+        for path in self._discoveryPaths():
+            for fname, is_test in collector.iterFiles(path):
+                jobs.append((collector, fname, is_test))
+        if self.workers > 1:
+            pool = multiprocessing.Pool(self.workers)
+            try:
+                results = pool.map(_collect_file, jobs)
+            finally:
+                pool.close()
+                pool.join()
+        else:
+            results = map(_collect_file, jobs)
+        for tests in results:
+            for test_info in tests:
+                if self.isSelected(test_info):
+                    self.testToDict(self.test_dict, test_info,
+                                    self.test_nodes)
+
+    def _spoolTest(self, test_info):
+        """
+        Append information about a test to spool file of current process.
+
+        Used in worker processes of multiprocess plugin, which never call
+        :py:meth:`finalize`. Every test is written immediately as a line
+        of json, so nothing is lost if worker gets killed.
+
+        :param test_info:
+            an instance of :py:class:`CollectedTest`
+        """
+        if self.spool_dir is None:
+            #main process collects tests itself
+            return
+        if self.spool_file is None:
+            self.spool_file = open(os.path.join(self.spool_dir,
+                '{0}.jsonl'.format(os.getpid())), 'a', 1)
+        self.spool_file.write(json.dumps(test_info.asDict()) + '\n')
+
+    def mergeSpool(self, spool_dir):
+        """
+        Add tests stored by worker processes to self.test_dict.
+
+        Order in which workers run tests (and names of their spool files)
+        differs between runs, so tests of merged modules are sorted
+        afterwards, in the order of nose loader (see :py:meth:`_loaderOrder`).
+
+        :param spool_dir:
+            directory containing spool files
+        """
+        merged = set()
+        for fname in sorted(glob.glob(os.path.join(spool_dir, '*.jsonl'))):
+            spool_file = open(fname)
+            try:
+                for line in spool_file:
+                    if line.strip():
+                        test_info = CollectedTest.fromDict(json.loads(line))
+                        merged.add(test_info.module)
+                        self.testToDict(self.test_dict, test_info,
+                                        self.test_nodes)
+            finally:
+                spool_file.close()
+        for module_name in merged:
+            current = self.test_dict
+            for submodule in module_name.split('.'):
+                current = current[submodule]
+            current['__tests__'].sort(key=self._loaderOrder)
+
+    @staticmethod
+    def _loaderOrder(test_info):
+        """
+        Return sort key putting tests of a module in the order in which
+        nose loader finds them when tests are run in a single process.
+
+        Test classes come first, by class name and method name, then test
+        functions by line number, then doctests (added by doctest plugin)
+        by name.
+
+        :param test_info:
+            an instance of :py:class:`CollectedTest`
+        :returns:
+            sort key
+        """
+        if test_info.type == 'TestCase':
+            return (0, test_info.name, 0, test_info.method or '')
+        elif test_info.type == 'FunctionTestCase':
+            return (1, '', test_info.lineno or 0, test_info.name)
+        return (2, test_info.name, 0, '')
+
+    def testToDict(self, test_dict, test_info, nodes=None):
+        """
+        For given test create proper entries in test_dict.
+
+        :param test_info:
+            an instance of :py:class:`CollectedTest`
+        :param test_dict:
+            python dictionary, will be modified
+        :param nodes:
+            optional python dictionary mapping module names to their
+            entries in test_dict, used to avoid walking test_dict
+            for every test of the same module; will be modified
+        """
+        if test_info.source is not None:
+            #equal doctest sources (like those read from spool or cache)
+            #are stored once
+            test_info.source = self.doc_sources.setdefault(test_info.source,
+                                                           test_info.source)
+        if nodes is not None and test_info.module in nodes:
+            nodes[test_info.module]['__tests__'].append(test_info)
+            return
+        modules = test_info.module.split('.')
+        current = test_dict
+        for submodule in modules:
+            if submodule in current:
+                pass
+            else:
+                current[submodule] = {}
+            current = current[submodule]
+        if '__tests__' in current:
+            current['__tests__'].append(test_info)
+        else:
+            current['__tests__'] = [test_info]
+        if nodes is not None:
+            nodes[test_info.module] = current
+
+    @classmethod
+    def _first_line(cls, func):
+        """
+        Return line number of first line of a function or method.
+
+        :param func:
+            function or method
+        :returns:
+            line number or None if it is not available
+        """
+        func = getattr(func, '__func__', func)
+        return getattr(getattr(func, '__code__', None), 'co_firstlineno', None)
+
+    @classmethod
+    def _signature(cls, func, bound=False):
+        """
+        Return signature of a function, like ``(a, b=1)``.
+
+        :param func:
+            function or method
+        :param bound:
+            skip first argument (self or cls)
+        :returns:
+            signature or empty string if it cannot be determined
+        """
+        func = getattr(func, '__func__', func)
+        try:
+            if hasattr(inspect, 'signature'):
+                signature = inspect.signature(func)
+                if bound:
+                    signature = signature.replace(
+                        parameters=list(signature.parameters.values())[1:])
+                return str(signature)
+            spec = inspect.getargspec(func)  # python 2
+            args = spec.args[1:] if bound else spec.args
+            defaults = spec.defaults
+            if bound and defaults and len(defaults) > len(args):
+                defaults = defaults[1:]
+            return inspect.formatargspec(args, spec.varargs, spec.keywords,
+                defaults)
+        except (TypeError, ValueError):
+            return ''
+
+    def _staticDoc(self, obj):
+        """
+        Capture documentation of a test class or function.
+
+        Documentation of classes is cached, so all tests of a class share it.
+        Members are public methods defined in the class, that have docstrings,
+        just like those documented by ``autoclass`` with ``:members:``.
+
+        :param obj:
+            test class or function
+        :returns:
+            value for :py:attr:`CollectedTest.doc`
+        """
+        if not inspect.isclass(obj):
+            return (self._signature(obj), inspect.getdoc(obj), ())
+        key = (obj.__module__, obj.__name__)
+        if key not in self.class_docs:
+            members = []
+            for name, value in sorted(vars(obj).items()):
+                if name.startswith('_'):
+                    continue
+                func = getattr(value, '__func__', value)
+                docstring = inspect.isfunction(func) and inspect.getdoc(func)
+                if docstring:
+                    members.append((name, self._signature(func,
+                        bound=not isinstance(value, staticmethod)),
+                        docstring))
+            docstring = vars(obj).get('__doc__')  # not inherited one
+            self.class_docs[key] = (None,
+                docstring and inspect.cleandoc(docstring), tuple(members))
+        return self.class_docs[key]
+
+    def extractTestInfo(self, test):
+        """
+        Extract usefull information from a test.
+
+        Documentation of a test is captured only when static
+        documentation is enabled.
+
+        :param test:
+            an instance of :py:class:`nose.case.Test`
+        :returns:
+            an instance of :py:class:`CollectedTest`, or None if the test
+            is excluded by filters, see :py:meth:`isSelected`
+        """
+        test_info, obj = self._extractTestInfo(test)
+        if not self.isSelected(test_info):
+            return None
+        if self.static_doc and obj is not None:
+            test_info.doc = self._staticDoc(obj)
+        if test_info.module not in self.module_files:
+            self.module_files[test_info.module] = self._moduleSource(
+                test_info.module)
+        test_info.file = self.module_files[test_info.module]
+        return test_info
+
+    def isSelected(self, test_info):
+        """
+        Check whether a test passes include and exclude filters.
+
+        :param test_info:
+            an instance of :py:class:`CollectedTest`
+        :returns:
+            True if the test matches any include filter (or there are none)
+            and no exclude filter
+        """
+        if self.include_filters and not any(
+                match(test_info) for match in self.include_filters):
+            return False
+        return not any(match(test_info) for match in self.exclude_filters)
+
+    @classmethod
+    def compileFilter(cls, spec):
+        """
+        Compile a test filter.
+
+        :param spec:
+            ``module:GLOB`` (or just ``GLOB``) matching tests of modules and
+            packages with names matching GLOB, ``name:REGEX`` searched
+            in full names of tests, or ``type:TYPE`` matching tests
+            of given type
+        :raises:
+            :py:exc:``ValueError`` for unknown kind of filter or test type
+        :returns:
+            function returning True for instances of :py:class:`CollectedTest`
+            matching the filter
+        """
+        kind, sep, pattern = spec.partition(':')
+        if not sep:
+            kind, pattern = 'module', spec
+        if kind == 'module':
+            regex = re.compile(fnmatch.translate(pattern))
+            matches = {}  # module name -> result, tests share their modules
+
+            def match(test_info):
+                module = test_info.module
+                if module not in matches:
+                    path = module.split('.')
+                    matches[module] = any(
+                        regex.match('.'.join(path[:i]))
+                        for i in range(1, len(path) + 1))
+                return matches[module]
+            return match
+        elif kind == 'name':
+            regex = re.compile(pattern)
+            return lambda test_info: bool(regex.search(test_info.fullName()))
+        elif kind == 'type':
+            if pattern not in TEST_TYPES:
+                raise ValueError('unknown test type in filter: ' + spec)
+            return lambda test_info: test_info.type == pattern
+        raise ValueError('unknown kind of filter: ' + spec)
+
+    def _extractTestInfo(self, test):
+        """
+        Extract usefull information from a test.
+
+        :param test:
+            an instance of :py:class:`nose.case.Test`
+        :returns:
+            tuple: an instance of :py:class:`CollectedTest` and documented
+            test class or function (None for doctests)
+        """
+        if isinstance(test.test, nose.plugins.doctests.DocTestCase):
+            address = test.test.address()  # tuple: (file, module, name)
+            module = address[1]
+            name = test.test.id().replace(module+'.', '', 1)
+            dt_test = test.test._dt_test
+            lineno = dt_test.lineno
+            if lineno is not None:
+                lineno += 1  # doctest counts lines from 0
+            return CollectedTest(module, name, 'DocTestCase',
+                source=dt_test.docstring, lineno=lineno), None
+
+        elif isinstance(test.test, nose.case.FunctionTestCase):
+            real_test = test.test.test  # get unwrapped test function
+            module = real_test.__module__
+            name = real_test.__name__
+            return CollectedTest(module, name, 'FunctionTestCase',
+                lineno=self._first_line(real_test)), real_test
+
+        elif isinstance(test.test, nose.case.MethodTestCase):
+            #method of a test class not derived from unittest.TestCase
+            module = test.test.cls.__module__
+            name = test.test.cls.__name__
+            method = test.test.method.__name__
+            return CollectedTest(module, name, 'TestCase',
+                lineno=self._first_line(test.test.method),
+                method=method), test.test.cls
+
+        elif isinstance(test.test, unittest.TestCase):
+            module = test.test.__module__
+            name = type(test.test).__name__
+            method = getattr(test.test, '_testMethodName', None)
+            lineno = None
+            if method:
+                lineno = self._first_line(
+                    getattr(type(test.test), method, None))
+            return CollectedTest(module, name, 'TestCase',
+                lineno=lineno, method=method), type(test.test)
+        else:
+            raise Exception('unsupported test type:' + str(test.test))
+
+    def processTests(self, tests):
+        """
+        Convert list of tests into a dictionary representing nested structure
+        of tests.
+
+        For example for given module structure:
+
+        .. code-block :: none
+
+            top_level_module
+                -> sub_module
+                    -> def test_me() ...
+                    -> class MyTest(TestCase) ...
+
+
+        result will look like this:
+
+        .. code-block :: javascript
+
+            {
+                'top_level_module': {
+                    'sub_module': {
+                        '__tests__: {
+                            'test_me': ,
+                            'MyTest': ,
+                     }
+                }
+            }
+
+        :param tests:
+            list of istances of :py:class:`CollectedTest`
+        :returns:
+            dictionary
+        """
+        test_dict = {}  # dict for storing test structure
+        nodes = {}  # cache of test_dict entries of modules
+
+        for test_info in tests:
+            self.testToDict(test_dict, test_info, nodes)
+        return test_dict
+
+    def countTests(self, test_dict):
+        """
+        Store number of tests in each module of test_dict, including tests
+        of its submodules.
+
+        Counts are computed in one pass from the bottom of the tree up,
+        each module only sums counts of its direct submodules.
+        Tests which ran longest in each module (with its submodules)
+        are stored under ``'__slowest__'`` key, counts under ``'__counts__'``
+        key of each module:
+
+        .. code-block :: javascript
+
+            {
+                'total': 3,  # number of all tests
+                'modules': 2,  # number of modules, including this one
+                'TestCase': 2,  # number of tests of each type
+                'FunctionTestCase': 0,
+                'DocTestCase': 1
+            }
+
+        :param test_dict:
+            python dictionary representing structure of tests,
+            will be modified
+        """
+        # explicit stack of (module, its submodules are counted), so that
+        # submodules are counted before their parent without recursion
+        stack = [(test_dict, False)]
+        while stack:
+            module_dict, ready = stack.pop()
+            if not ready:
+                stack.append((module_dict, True))
+                stack.extend((module_dict[submodule], False)
+                             for submodule in self._submodules(module_dict))
+                continue
+            counts = dict.fromkeys(TEST_TYPES, 0)
+            counts['modules'] = 1
+            for test_info in module_dict.get('__tests__', ()):
+                counts[test_info.type] = counts.get(test_info.type, 0) + 1
+            counts['total'] = len(module_dict.get('__tests__', ()))
+            slowest = [test_info
+                       for test_info in module_dict.get('__tests__', ())
+                       if test_info.duration is not None]
+            for submodule in self._submodules(module_dict):
+                for key, value in module_dict[submodule]['__counts__'].items():
+                    counts[key] = counts.get(key, 0) + value
+                slowest.extend(module_dict[submodule]['__slowest__'])
+            module_dict['__counts__'] = counts
+            module_dict['__slowest__'] = heapq.nlargest(SLOWEST_TESTS, slowest,
+                key=lambda test_info: test_info.duration)
+
+    def sphinxSection(self, name, section_char='-'):
+        """
+        Generate sphinx-formatted header.
+
+        :param name:
+            Section name
+        :param section_char:
+            character used for marging section type
+        :returns:
+            Sphinx section header.
+        """
+        return self.renderer.heading(name, section_char)
+
+    @classmethod
+    def _walkFiles(cls, dirname, skip_dirs=False):
+        """
+        Iterate over files in a directory tree.
+
+        Unlike :py:func:`os.walk` (before python 3.12) it does not recurse,
+        so it does not fail on trees deeper than recursion limit. Symbolic
+        links to directories are not followed.
+
+        :param dirname:
+            directory name
+        :param skip_dirs:
+            do not descend into directories never touched by the plugin
+            (see :py:meth:`_isSkippedDir`)
+        :returns:
+            iterator of file names relative to dirname
+        """
+        stack = ['']
+        while stack:
+            path = stack.pop()
+            for basename in sorted(os.listdir(os.path.join(dirname, path)),
+                                   reverse=True):
+                name = os.path.join(path, basename)
+                full_name = os.path.join(dirname, name)
+                if os.path.islink(full_name) or not os.path.isdir(full_name):
+                    yield name
+                elif not (skip_dirs and cls._isSkippedDir(basename)):
+                    stack.append(name)
+
+    @classmethod
+    def _isSkippedDir(cls, name):
+        """
+        Check if a directory in output directory belongs to other tools
+        (like ``_build`` of sphinx or hidden directories).
+        """
+        return name.startswith('.') or name in SKIPPED_DIRS
+
+    @classmethod
+    def _removeTree(cls, dirname):
+        """
+        Remove directory tree, ignoring errors.
+
+        Unlike :py:func:`shutil.rmtree` (before python 3.12) it does not
+        recurse, see :py:meth:`_walkFiles`.
+
+        :param dirname:
+            directory name
+        """
+        stack = [(dirname, False)]
+        while stack:
+            path, emptied = stack.pop()
+            try:
+                if emptied:
+                    os.rmdir(path)
+                    continue
+                stack.append((path, True))
+                for name in os.listdir(path):
+                    full_name = os.path.join(path, name)
+                    if os.path.islink(full_name) or not os.path.isdir(
+                            full_name):
+                        os.remove(full_name)
+                    else:
+                        stack.append((full_name, False))
+            except OSError as exc:
+                LOGGER.debug('can not remove %s: %s', path, exc)
+
+    @classmethod
+    def _makedirs(cls, dirname):
+        """
+        Create directory structure without failing on existing dirs.
+
+        :py:func:`os.makedirs` calls itself for each missing parent
+        directory, so missing parents are created one by one, from the top.
+
+        :param dirname:
+            directory name
+        :raises:
+            :py:exc:``OSError``
+        :returns:
+            None
+        """
+        missing = [dirname]
+        parent = os.path.dirname(dirname)
+        while parent and not os.path.isdir(parent):
+            missing.append(parent)
+            parent = os.path.dirname(parent)
+        for path in reversed(missing):
+            try:
+                os.makedirs(path)
+            except OSError as exc:
+                if exc.errno == errno.EEXIST:
+                    pass
+                else:
+                    raise
+
+    def _gen_header(self, module_path):
+        """
+        Generate header.
+
+        :param module_path:
+            list of module names
+        :returns:
+            text of section header
+        """
+        header = 'Tests'
+        if module_path:
+            header = '{0}'.format(module_path[-1])
+        return header
+
+    def _document_test_case(self, test_info, short=False):
+        """
+        Return sphinx-formatted documentation of a test case.
+
+        Generate documentation for a :py:class:``nose.case.TestCase``
+        type of test.
+
+        :param test_info:
+            an instance of :py:class:`CollectedTest`
+        :param short:
+            refer to test without module name (set by ``currentmodule``)
+        :returns:
+            sphinx-formatted text
+        """
+        if self.static_doc and test_info.doc is not None:
+            return self._document_static(test_info, 'class')
+        return self.renderer.autodoc('autoclass', '{0}{1}'.format(
+            '' if short else test_info.module + '.', test_info.name),
+            [':members:'])
+
+    def _document_static(self, test_info, directive):
+        """
+        Return documentation of a test using captured docstrings.
+
+        Python domain directives are used instead of autodoc ones,
+        so sphinx does not have to import tests.
+
+        :param test_info:
+            an instance of :py:class:`CollectedTest` with doc captured
+        :param directive:
+            either 'class' or 'function'
+        :returns:
+            sphinx-formatted text
+        """
+        signature, docstring, members = test_info.doc
+        return self.renderer.staticDoc(directive, '{0}.{1}'.format(
+            test_info.module, test_info.name), signature, docstring, members)
+
+    def _document_doc_test_case(self, test_info):
+        """
+        Return sphinx-formatted documentation of a doctest case.
+
+        Generate documentation for a
+        :py:class:``nose.plugins.doctest.DocTestCase``
+        type of test.
+
+        :param test_info:
+            an instance of :py:class:`CollectedTest`
+        :returns:
+            sphinx-formatted text
+        """
+        docstring = test_info.source.expandtabs()
+        docstring_lines = self._lstrip_common_spaces(docstring.split('\n'))
+        return self.renderer.codeBlock('Doctest in {0}.{1}:'.format(
+            test_info.module, test_info.name), docstring_lines, 'python')
+
+    def _lstrip_common_spaces(self, lines):
+        """
+        Remove prefixing spaces, without affecting text indentation.
+        I.e. if first line contains 4 prefixing spaces, and second
+        contains 8 spaces, return first line empty, and second with 4 prefixing spaces.
+
+        Tabs are not expanded here, lines containing them should be passed
+        through :py:meth:`str.expandtabs` first.
+
+        :param lines:
+            lines of text
+        :returns:
+            lines of text with common indentation removed
+        """
+        min_val = min([len(line) - len(line.lstrip(' '))
+                       for line in lines if line] or [0])
+        if min_val > 0:
+            return [line[min_val:] for line in lines]
+        return lines
+
+    def _document_function_test_case(self, test_info, short=False):
+        """
+        Return sphinx-formatted documentation of a test function.
+
+        Generate documentation for a :py:class:``nose.case.FunctionTestCase``
+        type of test.
+
+        :param test_info:
+            an instance of :py:class:`CollectedTest`
+        :param short:
+            refer to test without module name (set by ``currentmodule``)
+        :returns:
+            sphinx-formatted text
+        """
+        if self.static_doc and test_info.doc is not None:
+            return self._document_static(test_info, 'function')
+        return self.renderer.autodoc('autofunction', '{0}{1}'.format(
+            '' if short else test_info.module + '.', test_info.name))
+
+    def _layout(self, test_info_list):
+        """
+        Return layout of autodoc directives used for tests of a module.
+
+        With 'auto' layout, tests are grouped when there are at least
+        two autodoc directives to shorten, otherwise the extra
+        ``currentmodule`` directive would not pay off.
+
+        :param test_info_list:
+            list of :py:class:`CollectedTest` instances of one module
+        :returns:
+            either 'full' or 'grouped'
+        """
+        if self.layout != 'auto':
+            return self.layout
+        autodoc = set()
+        for test_info in test_info_list:
+            if test_info.type == 'DocTestCase' or (self.static_doc and
+                                                   test_info.doc is not None):
+                continue
+            autodoc.add(test_info.name)
+            if len(autodoc) > 1:
+                return 'grouped'
+        return 'full'
+
+    def _document_tests(self, test_info_list):
+        """
+        Generate sphinx section with a list of references to tests.
+
+        :param test_info_list:
+            List of :py:class:`CollectedTest` instances
+        :returns:
+            sphinx-formatted documentation of test
+        """
+        if not test_info_list:
+            return ''
+        lines = []
+        lines.append(self.sphinxSection('Available tests'))
+
+        grouped = self._layout(test_info_list) == 'grouped'
+        if grouped:
+            #all tests of a page come from the same module
+            lines.append(self.renderer.autodoc('currentmodule',
+                test_info_list[0].module))
+        classes = set()  # grouped classes are documented once
+        for test_info in test_info_list:
+            if test_info.type == 'TestCase':
+                if grouped and test_info.name in classes:
+                    continue
+                classes.add(test_info.name)
+                lines.append(self._document_test_case(test_info, grouped))
+            elif test_info.type == 'DocTestCase':
+                lines.append(self._document_doc_test_case(test_info))
+            elif test_info.type == 'FunctionTestCase':
+                lines.append(self._document_function_test_case(test_info,
+                    grouped))
+            else:
+                raise Exception('unknown test type')
+        lines.append('\n')
+        if self.results and any(test_info.status
+                                for test_info in test_info_list):
+            lines.append(self.sphinxSection('Test results'))
+            lines.append(self._results_table(test_info_list))
+        return ''.join(lines)
+
+    def _results_table(self, test_info_list, full_names=False):
+        """
+        Generate table with status and duration of tests.
+
+        :param test_info_list:
+            list of :py:class:`CollectedTest` instances
+        :param full_names:
+            show names of tests with module names
+        :returns:
+            sphinx-formatted table
+        """
+        header = ['Test', 'Status', 'Duration [s]']
+        if self.history:
+            header.append('Trend')
+        rows = []
+        for test_info in test_info_list:
+            name = test_info.label()
+            if full_names:
+                name = test_info.fullName()
+            status = test_info.status or 'not run'
+            if status in ('failed', 'error'):
+                status = self.renderer.strong(status)
+            duration = ''
+            if test_info.duration is not None:
+                duration = '{0:.3f}'.format(test_info.duration)
+            row = [self.renderer.literal(name), status, duration]
+            if self.history:
+                row.append(self._trend(test_info))
+            rows.append(row)
+        return self.renderer.table(header, rows)
+
+    def _countText(self, test_dict):
+        """
+        Describe number of tests in a module and its submodules.
+
+        :param test_dict:
+            part of test dictionary with counts, see :py:meth:`countTests`
+        :returns:
+            text like ``3 tests: 2 TestCase, 1 DocTestCase``
+        """
+        counts = test_dict['__counts__']
+        by_type = ', '.join('{0} {1}'.format(counts[test_type], test_type)
+                            for test_type in TEST_TYPES if counts[test_type])
+        text = '{0} {1}'.format(counts['total'],
+            'test' if counts['total'] == 1 else 'tests')
+        if by_type:
+            text = '{0}: {1}'.format(text, by_type)
+        return text
+
+    def _get_toc(self, test_dict):
+        """
+        Generate TOC for submodules.
+        """
+        return self.renderer.toc([('{0} ({1})'.format(submodule,
+            test_dict[submodule]['__counts__']['total']),
+            './{0}/index'.format(submodule))
+            for submodule in self._submodules(test_dict)])
+
+    @classmethod
+    def _fileHash(cls, fname):
+        """
+        Return md5 hash of file content.
+
+        :param fname:
+            file name
+        :raises:
+            :py:exc:``IOError``
+        :returns:
+            hex digest of file content or None if file does not exist
+        """
+        try:
+            docfile = open(fname, 'rb')
+        except IOError as exc:
+            if exc.errno == errno.ENOENT:
+                return None
+            else:
+                raise
+        try:
+            return hashlib.md5(docfile.read()).hexdigest()
+        finally:
+            docfile.close()
+
+    def _writeFile(self, fname, content):
+        """
+        Write content to a file, unless it already contains the same text.
+
+        Leaving unchanged files untouched keeps their mtime, so sphinx
+        will only rebuild pages that really changed.
+
+        :param fname:
+            file name
+        :param content:
+            text to write
+        :returns:
+            True if file has been written, False if it was up to date
+        """
+        self.generated_files.add(os.path.abspath(fname))
+        if not isinstance(content, bytes):
+            content = content.encode('utf-8')
+        digest = hashlib.md5(content).hexdigest()
+        previous = self._previousFile(fname)
+        if previous is None:
+            if self._fileHash(fname) == digest:
+                return False
+        elif (self._fileHash(previous) == digest and
+                self._linkFile(previous, fname)):
+            return False
+        self._makedirs(os.path.dirname(fname))
+        docfile = open(fname, 'wb')
+        try:
+            docfile.write(content)
+        finally:
+            docfile.close()
+        return True
+
+    def _loadGenerated(self, dirname):
+        """
+        Return files created by the plugin in previous run.
+
+        :param dirname:
+            name of output directory
+        :returns:
+            set of names relative to dirname, listed in
+            :py:data:`GENERATED_LIST_FILE`; empty if there is no such file
+        """
+        try:
+            list_file = open(os.path.join(dirname, GENERATED_LIST_FILE))
+        except IOError as exc:
+            if exc.errno == errno.ENOENT:
+                return set()
+            else:
+                raise
+        try:
+            names = set(line.rstrip('\n') for line in list_file)
+        finally:
+            list_file.close()
+        names.discard('')
+        return set(name for name in names
+                   if not os.path.isabs(name) and not any(
+                       part == os.pardir or self._isSkippedDir(part)
+                       for part in name.split(os.sep)[:-1]))
+
+    def _removeStale(self, dirname):
+        """
+        Remove generated files that were not written in current run.
+
+        Only files created by the plugin in previous run (see
+        :py:meth:`_loadGenerated`) are removed, directories left empty
+        are removed as well. Then files written in current run are listed
+        for the next one.
+
+        :param dirname:
+            name of output directory
+        """
+        dirname = os.path.abspath(dirname)
+        written = set(os.path.relpath(fname, dirname)
+                      for fname in self.generated_files
+                      if fname.startswith(dirname + os.sep))
+        written.discard(GENERATED_LIST_FILE)
+        for name in sorted(self._loadGenerated(dirname) - written):
+            full_name = os.path.join(dirname, name)
+            if not os.path.isfile(full_name):
+                continue
+            LOGGER.debug('removing stale file %s', full_name)
+            os.remove(full_name)
+            path = os.path.dirname(full_name)
+            while path != dirname and not os.listdir(path):
+                os.rmdir(path)
+                path = os.path.dirname(path)
+        self._writeFile(os.path.join(dirname, GENERATED_LIST_FILE),
+            ''.join(name + '\n' for name in sorted(written)))
+
+    def _render_page(self, test_dict, module_path):
+        """
+        Return text of a single page.
+
+        :param test_dict:
+            part of test dictionary for rendered module
+        :param module_path:
+            list of module names
+        :returns:
+            sphinx-formatted text
+        """
+        lines = []
+        header = self._gen_header(module_path)
+
+        lines.append(self.sphinxSection(header, section_char='='))
+        if module_path:
+            lines.append(self.renderer.paragraph('Tests in {0} ({1}):'.format(
+                self.renderer.literal('.'.join(module_path)),
+                self._countText(test_dict))))
+        else:
+            lines.append(self.renderer.paragraph(
+                'Tests in this project ({0}):'.format(
+                    self._countText(test_dict))))
+
+        lines.append(self._get_toc(test_dict))
+        if module_path == [] and self.regressions is not None:
+            lines.append(self.renderer.toc([('Performance regressions ({0})'
+                .format(len(self.regressions)), './regressions')]))
+
+        if '__tests__' in test_dict:
+            if self._shardCount(test_dict) > 1:
+                lines.append(self._get_shard_toc(test_dict))
+            else:
+                lines.append(self._document_tests(test_dict['__tests__']))
+
+        #pages without submodules would repeat their table of results
+        if (self.results and test_dict.get('__slowest__') and
+                self._submodules(test_dict)):
+            lines.append(self.sphinxSection('Slowest tests'))
+            lines.append(self._results_table(test_dict['__slowest__'],
+                full_names=True))
+
+        if module_path == [] or self.graph_pages:  # top-level or every page
+            if self.draw_graph:
+                lines.append(self.sphinxSection('Test graph'))
+                lines.append(self.renderer.graph('tests.dot'))
+        return self.renderer.page(header, ''.join(lines))
+
+    def _shardCount(self, test_dict):
+        """
+        Return number of pages with tests of given module.
+
+        :param test_dict:
+            part of test dictionary for given module
+        :returns:
+            1 if all tests are documented on module page, otherwise
+            number of separate pages they are split into
+        """
+        count = len(test_dict.get('__tests__', ()))
+        if not self.page_size or count <= self.page_size:
+            return 1
+        return (count + self.page_size - 1) // self.page_size
+
+    def _get_shard_toc(self, test_dict):
+        """
+        Generate TOC of pages with tests of a module split into several pages.
+        """
+        count = len(test_dict['__tests__'])
+        entries = []
+        for number in range(self._shardCount(test_dict)):
+            start = number * self.page_size
+            entries.append(('Tests {0}-{1}'.format(start + 1,
+                min(start + self.page_size, count)),
+                './' + SHARD_PAGE.format(number + 1)))
+        return self.sphinxSection('Available tests') + self.renderer.toc(
+            entries)
+
+    def _render_shard(self, test_dict, module_path, number):
+        """
+        Return text of a single page with part of tests of a module.
+
+        :param test_dict:
+            part of test dictionary for rendered module
+        :param module_path:
+            list of module names
+        :param number:
+            number of the page, counted from 0
+        :returns:
+            sphinx-formatted text
+        """
+        tests = test_dict['__tests__']
+        start = number * self.page_size
+        end = min(start + self.page_size, len(tests))
+        title = '{0}: tests {1}-{2}'.format(self._gen_header(module_path),
+            start + 1, end)
+        lines = [self.sphinxSection(title, section_char='=')]
+        lines.append(self._document_tests(tests[start:end]))
+        return self.renderer.page(title, ''.join(lines))
+
+    @classmethod
+    def _submodules(cls, test_dict):
+        """
+        Return sorted names of submodules of given module.
+
+        :param test_dict:
+            part of test dictionary for given module
+        """
+        return sorted(name for name in test_dict if name not in NODE_KEYS)
+
+    def _iterPages(self, test_dict, dirname, module_path):
+        """
+        Iterate over pages of given module and all of its submodules.
+
+        :param test_dict:
+            part of test dictionary for given module
+        :param dirname:
+            output directory for given module
+        :param module_path:
+            list of module names
+        :returns:
+            iterator over (test_dict, path) tuples, where path is
+            a :py:class:`ModulePath`; parent modules come before their
+            submodules
         """
-        Add test to list of tests stored in self.tests.
-
-        :param test:
-            an instance of :py:class:`nose.case.Test`
+        # explicit stack instead of recursion, so depth of the tree is not
+        # limited by recursion limit; paths of submodules link to path
+        # of their parent, so nothing is copied
+        stack = [(test_dict, ModulePath(None, None, module_path, dirname))]
+        while stack:
+            test_dict, path = stack.pop()
+            yield test_dict, path
+            # reversed, so submodules are popped in sorted order
+            stack.extend((test_dict[m], ModulePath(path, m))
+                         for m in reversed(self._submodules(test_dict)))
+
+    def _writePage(self, page):
         """
-        self.tests.append(test)
+        Render and write a single page.
 
-    def testToDict(self, test_dict, test_info):
+        :param page:
+            tuple returned by :py:meth:`_iterPages`
+        :returns:
+            True if file has been written
         """
-        For given test create proper entries in test_dict.
+        test_dict, path = page
+        dirname = path.dirname()
+        module_path = path.modules()
+        if self.draw_graph and self.graph_pages:
+            self._writeFile(os.path.join(dirname, 'tests.dot'),
+                self._pageGraph(test_dict, module_path))
+        extension = self.renderer.extension
+        written = self._writeFile(os.path.join(dirname, 'index' + extension),
+            self._render_page(test_dict, module_path))
+        shards = self._shardCount(test_dict)
+        if shards > 1:
+            for number in range(shards):
+                if self._writeFile(os.path.join(dirname,
+                            SHARD_PAGE.format(number + 1) + extension),
+                        self._render_shard(test_dict, module_path, number)):
+                    written = True
+        return written
+
+    def _pageGraph(self, test_dict, module_path):
+        """
+        Return graph of tests of a single page in graphviz dot format.
+
+        Submodules are drawn with all their tests while their size fits
+        into :py:attr:`graph_limit` nodes, bigger ones are collapsed into
+        a single node with number of their tests (they have graphs on their
+        own pages). Same goes for tests of the module itself, so size of the
+        graph does not depend on size of the project.
 
-        :param test_info:
-            python dictionary with information about a test,
-            contains keys:
-            * module: module name
-            * name: test name
-            * test: an instance of :py:class:`nose.case.Test`
-            * type: either "DocTestCase", "FunctionTestCase" or "TestCase"
         :param test_dict:
-            python dictionary, will be modified
+            part of test dictionary for given module
+        :param module_path:
+            list of module names
+        :returns:
+            text of dot file
         """
-        modules = test_info['module'].split('.')
-        current = test_dict
-        for submodule in modules:
-            if submodule in current:
-                pass
-            else:
-                current[submodule] = {}
-            current = current[submodule]
-        if '__tests__' in current:
-            current['__tests__'].append(test_info)
+        module_name = '.'.join(module_path)
+        budget = self.graph_limit
+        lines = ['graph {\n']
+        if module_path:
+            lines.append('    label="Tests in {0}";\n'.format(module_name))
+            lines.append('        "{0}" [label="{1}"];\n'.format(
+                module_name, module_path[-1]))
         else:
-            current['__tests__'] = [test_info]
+            lines.append('    label="Tests";\n')
+        tests = test_dict.get('__tests__', ())
+        if len(tests) <= budget:
+            budget -= len(tests)
+            lines.extend(DotWriter.moduleLines(test_dict, module_path,
+                with_module=False))
+        elif tests:
+            budget -= 1
+            lines.extend(DotWriter.summaryLines(module_name + '.__tests__',
+                '{0} tests'.format(len(tests)), module_path))
+        for submodule in self._submodules(test_dict):
+            sub_path = module_path + [submodule]
+            counts = test_dict[submodule]['__counts__']
+            nodes = counts['modules'] + counts['total']
+            if nodes <= budget:
+                budget -= nodes
+                for sub_dict, path in self._iterPages(test_dict[submodule],
+                                                      '', sub_path):
+                    lines.extend(DotWriter.moduleLines(sub_dict,
+                                                       path.modules()))
+            else:
+                budget -= 1
+                lines.extend(DotWriter.summaryLines('.'.join(sub_path),
+                    '{0} ({1} tests)'.format(submodule, counts['total']),
+                    module_path))
+        lines.append('}\n')
+        return ''.join(lines)
 
-    def extractTestInfo(self, test):
+    def _traverse(self, test_dict, dirname, module_path, writers=()):
         """
-        Extract usefull information from a test.
+        Write pages for given module and all of its submodules.
 
-        :param test:
-            an instance of :py:class:`nose.case.Test`
-        :returns:
-            dictionary with following keys
-                * module
-                    module name
-                * name
-                    test name
-                * test
-                    :py:class:`nose.case.Test` instance
-                * type
-                    either 'DocTestCase', 'FunctionTestCase' or 'TestCase'
-        """
-        if isinstance(test.test, nose.plugins.doctests.DocTestCase):
-            address = test.test.address()  # tuple: (file, module, name)
-            module = address[1]
-            name = test.test.id().replace(module+'.', '', 1)
-            return {'module': module, 'name': name,
-                'test': test, 'type': 'DocTestCase'}
-           
-        elif isinstance(test.test, nose.case.FunctionTestCase):
-            real_test = test.test.test  # get unwrapped test function
-            module = real_test.__module__
-            name = real_test.__name__
-            return {'module': module, 'name': name,
-                'test': test, 'type': 'FunctionTestCase'}
+        Pages do not depend on each other, so with more than one worker
+        they are rendered and written concurrently, giving the same output.
 
-        elif isinstance(test.test, unittest.TestCase):
-            module = test.test.__module__
-            name = type(test.test).__name__
-            return {'module': module, 'name': name,
-                'test': test, 'type': 'TestCase'}
+        :param test_dict:
+            part of test dictionary for given module
+        :param dirname:
+            output directory for given module
+        :param module_path:
+            list of module names
+        :param writers:
+            :py:class:`StreamWriter` instances receiving modules as they are
+            traversed
+        """
+        pages = self._iterPages(test_dict, dirname, module_path)
+        if writers:
+            pages = self._streamPages(pages, writers)
+        if self.workers > 1:
+            pool = ThreadPool(self.workers)
+            try:
+                for _written in pool.imap_unordered(self._writePage, pages,
+                                                     chunksize=16):
+                    pass
+            finally:
+                pool.close()
+                pool.join()
         else:
-            raise Exception('unsupported test type:' + str(test.test))
+            for page in pages:
+                self._writePage(page)
 
-    def processTests(self, tests):
+    def _streamPages(self, pages, writers):
         """
-        Convert list of tests into a dictionary representing nested structure
-        of tests.
+        Add each page to stream writers before passing it on.
 
-        For example for given module structure:
+        Pool reads pages in order from a single thread, so streamed files
+        do not depend on number of workers.
 
-        .. code-block :: none
+        :param pages:
+            iterator returned by :py:meth:`_iterPages`
+        :param writers:
+            list of :py:class:`StreamWriter` instances
+        """
+        for page in pages:
+            for writer in writers:
+                self._streamPage(writer, page)
+            yield page
 
-            top_level_module
-                -> sub_module
-                    -> def test_me() ...
-                    -> class MyTest(TestCase) ...
+    def _streamPage(self, writer, page):
+        """
+        Add a single page to a stream writer.
+        """
+        writer.addModule(page[0], page[1].modules())
 
+    def _openStream(self, writer_class, fname):
+        """
+        Start writing a streamed file.
 
-        result will look like this:
+        File is written to a temporary file in the same directory,
+        which replaces fname in :py:meth:`_closeStream`.
 
-        .. code-block :: javascript
+        :param writer_class:
+            subclass of :py:class:`StreamWriter`
+        :param fname:
+            name of written file
+        :returns:
+            writer_class instance
+        """
+        dirname, basename = os.path.split(os.path.abspath(fname))
+        self._makedirs(dirname)
+        return writer_class(open(os.path.join(dirname,
+            '.{0}.{1}.tmp'.format(basename, os.getpid())), 'wb'))
 
-            {
-                'top_level_module': {
-                    'sub_module': {
-                        '__tests__: {
-                            'test_me': ,
-                            'MyTest': ,
-                     }
-                }
-            }
+    def _closeStream(self, writer, fname):
+        """
+        Finish streamed file and move it to fname, unless fname has the same
+        content.
 
-        :param tests:
-            list of istances of :py:class:`nose.case.Test`
+        :param writer:
+            :py:class:`StreamWriter` returned by :py:meth:`_openStream`
+        :param fname:
+            name of written file
         :returns:
-            dictionary
+            True if file has been written, False if it was up to date
         """
-        test_dict = {}  # dict for storing test structure
-
-        for test in tests:
-            test_info = self.extractTestInfo(test)
-            self.testToDict(test_dict, test_info)
-        return test_dict
+        self.generated_files.add(os.path.abspath(fname))
+        tmpname = writer.outfile.name
+        digest = writer.close()
+        previous = self._previousFile(fname)
+        if previous is None:
+            if self._fileHash(fname) == digest:
+                os.remove(tmpname)
+                return False
+        elif (self._fileHash(previous) == digest and
+                self._linkFile(previous, fname)):
+            os.remove(tmpname)
+            return False
+        if os.path.exists(fname):  # python 2 on windows can not replace
+            os.remove(fname)
+        os.rename(tmpname, fname)
+        return True
+
+    def _abortStream(self, writer):
+        """
+        Close and remove unfinished streamed file.
+        """
+        writer.outfile.close()
+        os.remove(writer.outfile.name)
 
-    def sphinxSection(self, name, section_char='-'):
+    def _iterTests(self, test_dict):
         """
-        Generate sphinx-formatted header.
+        Iterate over all tests stored in test_dict.
 
-        :param name:
-            Section name
-        :param section_char:
-            character used for marging section type
+        :param test_dict:
+            python dictionary representing structure of tests
         :returns:
-            Sphinx section header.
+            iterator over :py:class:`CollectedTest` instances
         """
-        return '{0}\n{1}\n{0}\n'.format(section_char * len(name), name)
+        stack = [test_dict]
+        while stack:
+            current = stack.pop()
+            for key, value in current.items():
+                if key == '__tests__':
+                    for test_info in value:
+                        yield test_info
+                elif key not in NODE_KEYS:
+                    stack.append(value)
+
+    def _moduleSource(self, module_name):
+        """
+        Return absolute name of source file of an imported module.
 
-    @classmethod
-    def _makedirs(cls, dirname):
+        :param module_name:
+            module name
+        :returns:
+            file name or None if it cannot be determined
         """
-        Create directory structure without failing on existing dirs.
+        fname = getattr(sys.modules.get(module_name), '__file__', None)
+        if not fname:
+            return None
+        if fname.endswith(('.pyc', '.pyo')) and os.path.exists(fname[:-1]):
+            fname = fname[:-1]
+        return os.path.abspath(fname)
+
+    def _sourceInfo(self, fname, cached=None):
+        """
+        Return information about current state of a source file.
 
-        :param dirname:
-            directory name
-        :raises:
-            :py:exc:``OSError``
+        File hash is computed only if mtime or size of a file differ from
+        cached information.
+
+        :param fname:
+            source file name
+        :param cached:
+            manifest entry of module stored in previous run or None
         :returns:
-            None
+            dictionary with keys source, mtime, size and hash or None
+            if file does not exist
         """
         try:
-            os.makedirs(dirname)
+            stat = os.stat(fname)
         except OSError as exc:
-            if exc.errno == errno.EEXIST:
-                pass
+            if exc.errno == errno.ENOENT:
+                return None
             else:
                 raise
+        info = {'source': fname, 'mtime': stat.st_mtime, 'size': stat.st_size}
+        if (cached and cached['source'] == fname and
+                cached['mtime'] == info['mtime'] and
+                cached['size'] == info['size']):
+            info['hash'] = cached['hash']
+        else:
+            info['hash'] = self._fileHash(fname)
+        return info
 
-    def _gen_header(self, module_path):
+    def loadManifest(self, fname):
         """
-        Generate header.
+        Read test cache stored by previous run.
 
-        :param module_path:
-            list of module names
+        :param fname:
+            manifest file name
         :returns:
-            text of section header
+            dictionary mapping module names to manifest entries,
+            empty if manifest does not exist or cannot be used
         """
-        header = 'Tests'
-        if module_path:
-            header = '{0}'.format(module_path[-1])
-        return header
+        try:
+            manifest_file = open(fname)
+        except IOError as exc:
+            if exc.errno == errno.ENOENT:
+                return {}
+            else:
+                raise
+        try:
+            manifest = json.load(manifest_file)
+        except ValueError:
+            LOGGER.warning('ignoring invalid manifest %s', fname)
+            return {}
+        finally:
+            manifest_file.close()
+        if manifest.get('version') != MANIFEST_VERSION:
+            LOGGER.debug('ignoring manifest %s with different version', fname)
+            return {}
+        if manifest.get('options') != self.collectionOptions():
+            #cached tests were selected by other rules
+            LOGGER.debug('ignoring manifest %s with different options', fname)
+            return {}
+        return manifest['modules']
+
+    def collectionOptions(self):
+        """
+        Return options deciding which tests are collected and what is
+        stored about them.
 
-    def _document_test_case(self, test_info):
+        Test cache stores only tests selected by these options, so it is
+        used only with the same ones.
+
+        :returns:
+            python dictionary of json serializable values
         """
-        Return sphinx-formatted documentation of a test case.
+        conf = getattr(self, 'conf', None)  # set by configure
+        options = getattr(conf, 'options', None)
+        test_match = getattr(conf, 'testMatch', None)
+
+        def patterns(regexes):
+            return [regex.pattern for regex in regexes or ()]
+        return {
+            'include': self.include_specs,
+            'exclude': self.exclude_specs,
+            'static_doc': bool(self.static_doc),
+            'discovery': self.discovery,
+            'test_match': test_match and test_match.pattern,
+            'nose_include': patterns(getattr(conf, 'include', None)),
+            'nose_exclude': patterns(getattr(conf, 'exclude', None)),
+            'doctests': bool(getattr(options, 'enable_plugin_doctest',
+                                     False)),
+            'doctest_tests': bool(getattr(options, 'doctest_tests', False)),
+        }
+
+    def updateManifest(self, modules, test_dict):
+        """
+        Merge tests collected in this run with test cache.
 
-        Generate documentation for a :py:class:``nose.case.TestCase``
-        type of test.
+        Modules collected in this run replace their cached entries.
+        Cached modules, that were not collected, are added to test_dict
+        if their source file did not change since they were stored.
 
-        :param test_info:
-            dictionary
+        :param modules:
+            dictionary returned by :py:meth:`loadManifest`
+        :param test_dict:
+            python dictionary representing structure of tests,
+            will be modified
         :returns:
-            sphinx-formatted text
+            updated dictionary of manifest entries
         """
-        lines = []
-        lines.append('{0}.. autoclass:: {1}.{2}\n'.format(
-                ' ' * 4, test_info['module'], test_info['name']))
-        lines.append('{0}:members:\n\n'.format(' ' * 8))
-        return ''.join(lines)
+        collected = {}
+        for test_info in self._iterTests(test_dict):
+            collected.setdefault(test_info.module, []).append(test_info)
+
+        result = {}
+        for module_name, test_infos in collected.items():
+            fname = self._moduleSource(module_name)
+            info = fname and self._sourceInfo(fname, modules.get(module_name))
+            if info:
+                info['tests'] = [self._cachedDict(test_info)
+                                 for test_info in test_infos]
+                result[module_name] = info
+
+        for module_name, cached in modules.items():
+            if module_name in collected:
+                continue
+            info = self._sourceInfo(cached['source'], cached)
+            if info is None or info['hash'] != cached['hash']:
+                LOGGER.debug('dropping outdated cache of %s', module_name)
+                continue
+            info['tests'] = cached['tests']
+            result[module_name] = info
+            for data in cached['tests']:
+                test_info = CollectedTest.fromDict(data)
+                #cached tests were not run in this run
+                test_info.status = test_info.duration = None
+                #filters may have changed since the tests were cached
+                if self.isSelected(test_info):
+                    self.testToDict(test_dict, test_info)
+        return result
 
-    def _document_doc_test_case(self, test_info):
+    def _cachedDict(self, test_info):
         """
-        Return sphinx-formatted documentation of a doctest case.
+        Return dictionary stored in test cache for a test.
 
-        Generate documentation for a
-        :py:class:``nose.plugins.doctest.DocTestCase``
-        type of test.
+        Results of the test are left out, they belong to the run
+        that collected it, not to the runs reusing it.
 
         :param test_info:
-            dictionary
+            an instance of :py:class:`CollectedTest`
         :returns:
-            sphinx-formatted text
+            dictionary returned by :py:meth:`CollectedTest.asDict`
+            without ``status`` and ``duration``
         """
-        lines = []
-        lines.append('{0}Doctest in {1}.{2}:\n{3}.. code-block:: python\n'.format(
-                ' ' * 4, test_info['module'], test_info['name'], ' ' * 8))
-        docstring = test_info['test'].test._dt_test.docstring
-        docstring_lines = self._lstrip_common_spaces(docstring.split('\n'))
-        lines.extend(['{0}{1}\n'.format(' ' * 12, line) for line in docstring_lines])
-        lines.append( ' ' * 8 + '\n')
-        return ''.join(lines)
+        data = test_info.asDict()
+        data.pop('status', None)
+        data.pop('duration', None)
+        return data
 
-    def _lstrip_common_spaces(self, lines):
+    def saveManifest(self, modules, fname):
         """
-        Remove prefixing spaces, without affecting text indentation.
-        I.e. if first line contains 4 prefixing spaces, and second
-        contains 8 spaces, return first line empty, and second with 4 prefixing spaces.
+        Store test cache for next run.
 
-        :param lines:
-            lines of text
-        :returns:
-            lines of text with 
+        :param modules:
+            dictionary returned by :py:meth:`updateManifest`
+        :param fname:
+            manifest file name
         """
-        result = lines
-        space_counters = [len(re.findall(r'^ +', line)[0])
-                            for line in result
-                            if len(line) > 0]
-        if space_counters:
-            min_val = min(space_counters)
-            if min_val > 0:
-                result = [re.sub('^\\ {{{0}}}'.format(min_val), '', line, count=1) for line in lines]
-        return result
+        self._writeFile(fname, json.dumps(
+            {'version': MANIFEST_VERSION, 'modules': modules,
+             'options': self.collectionOptions()},
+            sort_keys=True, separators=(',', ':')))
 
-    def _document_function_test_case(self, test_info):
+    def updateHistory(self, test_dict, fname):
         """
-        Return sphinx-formatted documentation of a test function.
+        Store durations of tests run in this run in history database and
+        find tests that became slower.
 
-        Generate documentation for a :py:class:``nose.case.FunctionTestCase``
-        type of test.
+        Every run appends one row per test to ``durations`` table, which is
+        never read back here. Recent durations of each test are kept in one
+        row of ``tests`` table, so the work done depends only on number
+        of tests, not on length of the history. Tests with the same full
+        name (like those yielded by test generators) are stored as one test
+        with the sum of their durations.
 
-        :param test_info:
-            dictionary
-        :returns:
-            sphinx-formatted text
+        Sets :py:attr:`history` (full test name -> recent durations,
+        ending with current one) and :py:attr:`regressions`.
+
+        :param test_dict:
+            python dictionary representing structure of tests
+            collected in this run
+        :param fname:
+            name of sqlite database, created if it does not exist
+        """
+        finished = []
+        positions = {}  # full test name -> its index in finished
+        for test_info in self._iterTests(test_dict):
+            if test_info.duration is None:
+                continue
+            name = test_info.fullName()
+            if name in positions:
+                #a copy, documented tests keep their own durations
+                total = CollectedTest.fromDict(
+                    finished[positions[name]].asDict())
+                total.duration += test_info.duration
+                finished[positions[name]] = total
+            else:
+                positions[name] = len(finished)
+                finished.append(test_info)
+
+        self.regressions = []
+        if not finished:
+            return
+        self._makedirs(os.path.dirname(os.path.abspath(fname)))
+        connection = sqlite3.connect(fname)
+        try:
+            with connection:
+                connection.execute('CREATE TABLE IF NOT EXISTS runs'
+                    ' (id INTEGER PRIMARY KEY, time REAL)')
+                connection.execute('CREATE TABLE IF NOT EXISTS tests'
+                    ' (id INTEGER PRIMARY KEY, name TEXT UNIQUE, recent TEXT)')
+                connection.execute('CREATE TABLE IF NOT EXISTS durations'
+                    ' (run INTEGER, test INTEGER, duration REAL)')
+                run_id = connection.execute('INSERT INTO runs (time)'
+                    ' VALUES (?)', (time.time(),)).lastrowid
+                known = dict((name, (test_id, recent))
+                    for test_id, name, recent in connection.execute(
+                        'SELECT id, name, recent FROM tests'))
+                new_tests = []
+                updated_tests = []
+                for test_info in finished:
+                    name = test_info.fullName()
+                    test_id, recent = known.get(name, (None, ''))
+                    previous = [float(value) for value in recent.split()]
+                    self._checkRegression(test_info, previous)
+                    durations = (previous + [test_info.duration])[
+                        -HISTORY_LENGTH:]
+                    self.history[name] = durations
+                    recent = ' '.join('{0:.6f}'.format(value)
+                                      for value in durations)
+                    if test_id is None:
+                        new_tests.append((name, recent))
+                    else:
+                        updated_tests.append((recent, test_id))
+                connection.executemany('INSERT INTO tests (name, recent)'
+                    ' VALUES (?, ?)', new_tests)
+                connection.executemany('UPDATE tests SET recent = ?'
+                    ' WHERE id = ?', updated_tests)
+                connection.executemany('INSERT INTO durations'
+                    ' (run, test, duration)'
+                    ' SELECT ?, id, ? FROM tests WHERE name = ?',
+                    ((run_id, test_info.duration, test_info.fullName())
+                     for test_info in finished))
+        finally:
+            connection.close()
+        #biggest slowdown first
+        self.regressions.sort(key=lambda item: item[1] / item[0].duration)
+
+    def _checkRegression(self, test_info, previous):
         """
-        return('{0}.. autofunction:: {1}.{2}\n\n'.format(
-            ' ' * 4, test_info['module'], test_info['name']))
+        Add test to :py:attr:`regressions` if it is slower than before.
 
-    def _document_tests(self, test_info_list):
+        Test is slower if its duration is at least
+        :py:attr:`regression_threshold` times the median of its previous
+        durations (and at least :py:data:`REGRESSION_MIN_DELTA` seconds
+        longer).
+
+        :param test_info:
+            an instance of :py:class:`CollectedTest` with duration
+        :param previous:
+            list of previous durations of the test
         """
-        Generate sphinx section with a list of references to tests.
+        if not previous:
+            return
+        baseline = sorted(previous)[len(previous) // 2]
+        if (test_info.duration >= baseline * self.regression_threshold and
+                test_info.duration - baseline >= REGRESSION_MIN_DELTA):
+            self.regressions.append((test_info, baseline))
+
+    def _trend(self, test_info):
+        """
+        Return sparkline of recent durations of a test and change of its
+        duration relative to median of previous ones.
 
-        :param test_info_list:
-            List of ``test_info`` dictionaries
+        :param test_info:
+            an instance of :py:class:`CollectedTest`
         :returns:
-            sphinx-formatted documentation of test
+            text, empty if there is no history of the test
         """
-        if not test_info_list:
+        durations = self.history.get(test_info.fullName())
+        if not durations:
             return ''
-        lines = []
-        lines.append(self.sphinxSection('Available tests'))
-
-        for test_info in test_info_list:
-            if test_info['type'] == 'TestCase':
-                lines.append(self._document_test_case(test_info))
-            elif test_info['type'] == 'DocTestCase':
-                lines.append(self._document_doc_test_case(test_info))
-            elif test_info['type'] == 'FunctionTestCase':
-                lines.append(self._document_function_test_case(test_info))
-            else:
-                raise Exception('unknown test type')
-        lines.append('\n')
-        return ''.join(lines)
+        low = min(durations)
+        scale = (max(durations) - low) or 1.0
+        spark = u''.join(SPARK_CHARS[int((value - low) / scale *
+                                         (len(SPARK_CHARS) - 1))]
+                         for value in durations)
+        previous = durations[:-1]
+        if not previous:
+            return spark
+        baseline = sorted(previous)[len(previous) // 2]
+        if not baseline:
+            return spark
+        return u'{0} {1}'.format(spark, self._change(durations[-1], baseline))
 
-    def _get_toc(self, test_dict):
+    @classmethod
+    def _change(cls, duration, baseline):
         """
-        Generate TOC for submodules.
+        Return relative change of duration, like ``+20%``.
         """
-        lines = []
-        submodules = sorted(test_dict.keys())
-        if '__tests__' in submodules:
-            submodules.remove('__tests__')
-        if submodules:
-            lines.append('.. toctree::\n')
-            lines.append('    :maxdepth: 1\n')
-            lines.append('\n')
-            for submodule in submodules:
-                lines.append('    {0}<./{0}/index>\n'.format(submodule))
-            lines.append('\n')
-        return ''.join(lines)
+        return '{0:+d}%'.format(int(round(
+            (duration - baseline) * 100.0 / baseline)))
 
-    def _traverse(self, test_dict, dirname, module_path):
+    def _render_regressions(self):
         """
+        Return text of page listing tests that became slower.
         """
-        self._makedirs(dirname)
-        docfile = open(os.path.join(dirname, 'index.rst'), 'w')
-        header = self._gen_header(module_path)
-
-        docfile.write(self.sphinxSection(header, section_char='='))
-        if module_path:
-            docfile.write('    Tests in ``{0}``:\n\n'.format(
-                '.'.join(module_path)))
+        title = 'Performance regressions'
+        lines = [self.sphinxSection(title, section_char='=')]
+        lines.append(self.renderer.paragraph('Tests at least {0} times slower'
+            ' than median of their previous durations:'.format(
+                self.regression_threshold)))
+        if not self.regressions:
+            lines.append(self.renderer.paragraph('No regressions found.'))
         else:
-            docfile.write('    Tests in this project:\n\n')
-
-        docfile.write(self._get_toc(test_dict))
-
-        if '__tests__' in test_dict:
-            docfile.write(self._document_tests(test_dict['__tests__']))
-
-        submodules = sorted(test_dict.keys())
-        if '__tests__' in submodules:
-            submodules.remove('__tests__')
-
-        #recursive calls
-        for m in submodules:
-            new_module_path = module_path[:]
-            new_module_path.append(m)
-            self._traverse(test_dict[m], os.path.join(dirname, m),
-                 new_module_path)
-        if module_path == []:  # top-level
-            if self.draw_graph:
-                docfile.write(self.sphinxSection('Test graph'))
-                docfile.write('.. graphviz:: tests.dot\n')
-
-        docfile.close()
-
-    def _drawGraph(self, test_dict, fname):
-        """
-        Draw graph for all tests.
-        """
-        def _traverse(test_dict, module_path):
-            """
-            """
-            lines = []
-            submodules = sorted(test_dict.keys())
-            if '__tests__' in test_dict:
-                submodules.remove('__tests__')
-                for test in test_dict['__tests__']:
-                    lines.append('        "{0}.{1}" [label="{1}"];\n'.format(
-                        '.'.join(module_path), test['name']))
-                    lines.append('        "{0}" -- "{0}.{1}";\n'.format(
-                        '.'.join(module_path), test['name']))
-
-            for submodule in submodules:
-                node_id = '{0}.{1}'.format('.'.join(module_path), submodule)
-                if not module_path:
-                    node_id = submodule
-                lines.append('        "{0}" [label="{1}"];\n'.format(
-                    node_id, submodule))
-                if module_path:
-                    lines.append('        "{0}" -- "{0}.{1}";\n'.format(
-                        '.'.join(module_path), submodule))
-                new_module_path = module_path[:]
-                new_module_path.append(submodule)
-                lines.append(_traverse(test_dict[submodule], new_module_path))
-            return ''.join(lines)
-
-        graphfile = open(fname, 'w')
-
-        graphfile.write('graph {\n')
-        graphfile.write('    label="Tests";\n')
-        graphfile.write(_traverse(test_dict, []))
-
-        graphfile.write('}\n')
-
-        graphfile.close()
+            lines.append(self.renderer.table(
+                ['Test', 'Previous [s]', 'Duration [s]', 'Change'],
+                [[self.renderer.literal(test_info.fullName()),
+                  '{0:.3f}'.format(baseline),
+                  '{0:.3f}'.format(test_info.duration),
+                  self._change(test_info.duration, baseline) if baseline
+                  else ''] for test_info, baseline in self.regressions]))
+        return self.renderer.page(title, ''.join(lines))
 
     def genSphinxDoc(self, test_dict, dirname):
         """
@@ -402,22 +2934,136 @@ class SphinxDocPlugin(Plugin):
         :param: dirname:
             name of output directory
         """
-        self._traverse(test_dict, dirname, [])
-        if self.draw_graph:
-            self._drawGraph(test_dict, os.path.join(dirname, 'tests.dot'))
+        self.generated_files = set()
+        self.countTests(test_dict)
+        streams = []
+        if self.draw_graph and not self.graph_pages:
+            streams.append((DotWriter, os.path.join(dirname, 'tests.dot')))
+        if self.json_file:
+            streams.append((JsonWriter, self.json_file))
+        writers = []
+        traversed = False
+        try:
+            for writer_class, fname in streams:
+                writers.append(self._openStream(writer_class, fname))
+            self._traverse(test_dict, dirname, [], writers)
+            traversed = True
+        finally:
+            #also when interrupted, temporary files are not left behind
+            if not traversed:
+                for writer in writers:
+                    self._abortStream(writer)
+        for writer, (_writer_class, fname) in zip(writers, streams):
+            self._closeStream(writer, fname)
+        if self.regressions is not None:
+            self._writeFile(os.path.join(dirname,
+                'regressions' + self.renderer.extension),
+                self._render_regressions())
+        self._removeStale(dirname)
 
     #methods inherited from Plugin
 
     def __init__(self, *args, **kwargs):
         super(SphinxDocPlugin, self).__init__(*args, **kwargs)
-        self.tests = []  # list of all tests
+        self.test_dict = {}  # structure of all tests, see processTests
+        self.test_nodes = {}  # module name -> its entry in self.test_dict
         self.draw_graph = False  # draw test graph
+        self.graph_pages = False  # draw separate graph on each page
+        self.graph_limit = 100  # max. number of nodes drawn in page graph
+        self.page_size = 0  # max. number of tests on a page, 0 - no limit
+        self.layout = 'full'  # layout of autodoc directives, see _layout
+        self.renderer = RstRenderer()  # markup of pages, see RENDERERS
+        self.use_cache = False  # reuse tests stored by previous run
+        self.workers = 1  # number of threads writing pages
+        self.generated_files = set()  # files written by genSphinxDoc
+        self.atomic = False  # write to staging directory and swap
+        self.output_dir = None  # staging directory, when publishing
+        self.previous_dir = None  # published directory, when publishing
+        self.is_worker = False  # running in multiprocess plugin worker
+        self.spool_dir = None  # directory for tests collected by workers
+        self.spool_file = None  # spool file of worker process
+        self.doc_only = False  # generate documentation without running tests
+        self.test_names = None  # names given to nose loader, in ast discovery
+        self.discovery = 'nose'  # how tests are found, 'nose' or 'ast'
+        self.static_doc = False  # write docstrings instead of autodoc
+        self.class_docs = {}  # (module, class name) -> captured class doc
+        self.module_files = {}  # module name -> its source file name
+        self.doc_sources = {}  # doctest source -> its shared copy
+        self.include_filters = []  # see compileFilter and isSelected
+        self.exclude_filters = []
+        self.include_specs = []  # filters as given in options
+        self.exclude_specs = []
+        self.results = False  # record results of tests and show them
+        self.running = {}  # id of running test -> [CollectedTest, start time]
+        self.history_file = None  # database with durations of previous runs
+        self.regression_threshold = 1.5  # slowdown reported as regression
+        self.history = {}  # full test name -> recent durations
+        self.regressions = None  # list of (CollectedTest, previous duration)
+        self.json_file = None  # name of exported test inventory
+        self.profiler = None  # Profiler instance, if profiling is enabled
+        self.doc_generated = False  # documentation was already written
+        self.manifest = {}  # test cache loaded from manifest file
+        self.cached_sources = {}  # source file name -> cached module name
 
     def prepareTestCase(self, test):
-        self.storeTest(test)
+        #in worker processes test is spooled after it is run, with results
+        #(if they are shown)
+        test_info = self.storeTest(test, spool=not self.results)
+        if test_info is not None and self.results:
+            self.running[id(test)] = [test_info, None]
+
+    def startTest(self, test):
+        entry = self.running.get(id(test))
+        if entry is not None:
+            entry[1] = time.time()
+
+    def addSuccess(self, test):
+        self._setStatus(test, 'passed')
+
+    def addFailure(self, test, err):
+        self._setStatus(test, 'failed')
+
+    def addError(self, test, err):
+        if issubclass(err[0], nose.plugins.skip.SkipTest):
+            self._setStatus(test, 'skipped')
+        else:
+            self._setStatus(test, 'error')
+
+    def stopTest(self, test):
+        entry = self.running.pop(id(test), None)
+        if entry is None:
+            return
+        test_info, start = entry
+        if start is not None:
+            test_info.duration = time.time() - start
+        if test_info.status is None:
+            #errors of classes handled by other plugins (like skip plugin)
+            #are not passed to addError
+            test_info.status = 'skipped'
+        if self.is_worker:
+            self._spoolTest(test_info)
+
+    def _setStatus(self, test, status):
+        """
+        Store result of a running test.
+
+        :param test:
+            an instance of :py:class:`nose.case.Test`
+        :param status:
+            test status
+        """
+        entry = self.running.get(id(test))
+        if entry is not None:
+            entry[0].status = status
 
     def begin(self):
-        pass
+        if self.profiler is not None:
+            self.profiler.startMemory()
+        if self.use_cache and not self.is_worker:
+            self.manifest = self.loadManifest(
+                os.path.join(self.doc_dir_name, MANIFEST_FILE))
+            self.cached_sources = dict((cached['source'], module_name)
+                for module_name, cached in self.manifest.items())
 
     def options(self, parser, env=os.environ):
         #skip super call to avoid adding --with-* option.
@@ -441,12 +3087,485 @@ class SphinxDocPlugin(Plugin):
                       help="Create test graph using sphinx grapviz extension,"
                            " use with sphinx_doc option"
                            " [NOSE_SPHINX_DOC_GRAPH]")
+        parser.add_option('--sphinx-doc-graph-pages',
+                      action='store_true',
+                      dest='sphinx_doc_graph_pages',
+                      default=env.get('NOSE_SPHINX_DOC_GRAPH_PAGES', False),
+                      help="Draw a separate graph on page of each module"
+                           " instead of one graph of all tests, implies"
+                           " sphinx_doc_graph [NOSE_SPHINX_DOC_GRAPH_PAGES]")
+        parser.add_option('--sphinx-doc-graph-limit',
+                      type='int',
+                      dest='sphinx_doc_graph_limit',
+                      default=int(env.get('NOSE_SPHINX_DOC_GRAPH_LIMIT', 100)),
+                      help="Maximal number of nodes of a page graph,"
+                           " bigger submodules are drawn as a single node,"
+                           " use with sphinx_doc_graph_pages option"
+                           " [NOSE_SPHINX_DOC_GRAPH_LIMIT]")
+        parser.add_option('--sphinx-doc-page-size',
+                      type='int',
+                      dest='sphinx_doc_page_size',
+                      default=int(env.get('NOSE_SPHINX_DOC_PAGE_SIZE', 0)),
+                      help="Maximal number of tests documented on a page,"
+                           " tests of bigger modules are split into"
+                           " several pages; 0 means no limit, use with"
+                           " sphinx_doc option [NOSE_SPHINX_DOC_PAGE_SIZE]")
+        parser.add_option('--sphinx-doc-layout',
+                      type='choice',
+                      choices=['full', 'grouped', 'auto'],
+                      dest='sphinx_doc_layout',
+                      default=env.get('NOSE_SPHINX_DOC_LAYOUT', 'full'),
+                      help="Layout of autodoc directives: 'full' refers to"
+                           " each test by its full name, 'grouped' sets"
+                           " current module once and documents each class"
+                           " once, 'auto' groups modules with more than one"
+                           " documented test [NOSE_SPHINX_DOC_LAYOUT]")
+        parser.add_option('--sphinx-doc-include',
+                      action='append',
+                      dest='sphinx_doc_include',
+                      default=nose.util.tolist(
+                          env.get('NOSE_SPHINX_DOC_INCLUDE')),
+                      metavar='FILTER',
+                      help="Document only tests matching FILTER, which is"
+                           " either module:GLOB (or just GLOB) matching"
+                           " modules and packages, name:REGEX searched in"
+                           " full test names, or type:TYPE; may be given"
+                           " several times to document tests matching any"
+                           " of them, use with sphinx_doc option"
+                           " [NOSE_SPHINX_DOC_INCLUDE]")
+        parser.add_option('--sphinx-doc-exclude',
+                      action='append',
+                      dest='sphinx_doc_exclude',
+                      default=nose.util.tolist(
+                          env.get('NOSE_SPHINX_DOC_EXCLUDE')),
+                      metavar='FILTER',
+                      help="Do not document tests matching FILTER, see"
+                           " sphinx_doc_include; may be given several times,"
+                           " use with sphinx_doc option"
+                           " [NOSE_SPHINX_DOC_EXCLUDE]")
+        parser.add_option('--sphinx-doc-format',
+                      type='choice',
+                      choices=sorted(RENDERERS),
+                      dest='sphinx_doc_format',
+                      default=env.get('NOSE_SPHINX_DOC_FORMAT', 'rst'),
+                      help="Format of generated pages: 'rst' for sphinx,"
+                           " 'myst' for sphinx with myst-parser, 'html' for"
+                           " static html pages browsable without sphinx,"
+                           " which implies sphinx_doc_static"
+                           " [NOSE_SPHINX_DOC_FORMAT]")
+        parser.add_option('--sphinx-doc-cache',
+                      action='store_true',
+                      dest='sphinx_doc_cache',
+                      default=env.get('NOSE_SPHINX_DOC_CACHE', False),
+                      help="Store collected tests in a manifest file and"
+                           " reuse tests of unchanged modules not collected"
+                           " in current run, use with sphinx_doc option"
+                           " [NOSE_SPHINX_DOC_CACHE]")
+        parser.add_option('--sphinx-doc-atomic',
+                      action='store_true',
+                      dest='sphinx_doc_atomic',
+                      default=env.get('NOSE_SPHINX_DOC_ATOMIC', False),
+                      help="Write documentation to a new directory and"
+                           " atomically replace output directory (a symbolic"
+                           " link) when it is complete, unchanged files are"
+                           " hard linked; use with sphinx_doc option"
+                           " [NOSE_SPHINX_DOC_ATOMIC]")
+        parser.add_option('--sphinx-doc-only',
+                      action='store_true',
+                      dest='sphinx_doc_only',
+                      default=env.get('NOSE_SPHINX_DOC_ONLY', False),
+                      help="Only collect tests and generate documentation,"
+                           " without running any tests, use with"
+                           " sphinx_doc option [NOSE_SPHINX_DOC_ONLY]")
+        parser.add_option('--sphinx-doc-discovery',
+                      type='choice',
+                      choices=['nose', 'ast'],
+                      dest='sphinx_doc_discovery',
+                      default=env.get('NOSE_SPHINX_DOC_DISCOVERY', 'nose'),
+                      help="How tests are found: 'nose' imports and collects"
+                           " them as usual, 'ast' parses source files without"
+                           " importing them and implies sphinx_doc_only"
+                           " [NOSE_SPHINX_DOC_DISCOVERY]")
+        parser.add_option('--sphinx-doc-static',
+                      action='store_true',
+                      dest='sphinx_doc_static',
+                      default=env.get('NOSE_SPHINX_DOC_STATIC', False),
+                      help="Write docstrings and signatures of tests into"
+                           " generated files instead of autodoc directives,"
+                           " so sphinx does not import tests, use with"
+                           " sphinx_doc option [NOSE_SPHINX_DOC_STATIC]")
+        parser.add_option('--sphinx-doc-json',
+                      dest='sphinx_doc_json',
+                      default=env.get('NOSE_SPHINX_DOC_JSON'),
+                      metavar='PATH',
+                      help="Also write inventory of tests to PATH in json"
+                           " lines format, with module, name, method, type,"
+                           " file and line of each test, use with"
+                           " sphinx_doc option [NOSE_SPHINX_DOC_JSON]")
+        parser.add_option('--sphinx-doc-results',
+                      action='store_true',
+                      dest='sphinx_doc_results',
+                      default=env.get('NOSE_SPHINX_DOC_RESULTS', False),
+                      help="Show status and duration of run tests on pages,"
+                           " which are then rewritten on every run, use"
+                           " with sphinx_doc option [NOSE_SPHINX_DOC_RESULTS]")
+        parser.add_option('--sphinx-doc-history',
+                      action='store_true',
+                      dest='sphinx_doc_history',
+                      default=env.get('NOSE_SPHINX_DOC_HISTORY', False),
+                      help="Store durations of tests in sqlite database next"
+                           " to output directory, show their trends and"
+                           " create page with performance regressions"
+                           " (implies sphinx_doc_results), use with"
+                           " sphinx_doc option [NOSE_SPHINX_DOC_HISTORY]")
+        parser.add_option('--sphinx-doc-regression',
+                      type='float',
+                      dest='sphinx_doc_regression',
+                      default=float(env.get('NOSE_SPHINX_DOC_REGRESSION',
+                                            1.5)),
+                      help="Report tests at least this many times slower"
+                           " than median of their previous durations as"
+                           " regressions, use with sphinx_doc_history option"
+                           " [NOSE_SPHINX_DOC_REGRESSION]")
+        parser.add_option('--sphinx-doc-profile',
+                      action='store_true',
+                      dest='sphinx_doc_profile',
+                      default=env.get('NOSE_SPHINX_DOC_PROFILE', False),
+                      help="Measure time used by documentation"
+                           " generation and store report in"
+                           " sphinx_doc_profile.json file in output"
+                           " directory [NOSE_SPHINX_DOC_PROFILE]")
+        parser.add_option('--sphinx-doc-profile-memory',
+                      action='store_true',
+                      dest='sphinx_doc_profile_memory',
+                      default=env.get('NOSE_SPHINX_DOC_PROFILE_MEMORY',
+                                      False),
+                      help="Measure also memory peaks of test collection"
+                           " and documentation generation, implies"
+                           " sphinx_doc_profile option, memory tracing"
+                           " slows down the whole run"
+                           " [NOSE_SPHINX_DOC_PROFILE_MEMORY]")
+        parser.add_option('--sphinx-doc-workers',
+                      type='int',
+                      dest='sphinx_doc_workers',
+                      default=int(env.get('NOSE_SPHINX_DOC_WORKERS', 1)),
+                      help="Number of threads rendering and writing pages"
+                           " (and of processes parsing files with ast"
+                           " discovery), use with sphinx_doc option"
+                           " [NOSE_SPHINX_DOC_WORKERS]")
 
     def configure(self, options, conf):
         super(SphinxDocPlugin, self).configure(options, conf)
         self.doc_dir_name = options.sphinx_doc_dir
-        self.draw_graph = options.sphinx_doc_graph
+        self.graph_pages = options.sphinx_doc_graph_pages
+        self.graph_limit = options.sphinx_doc_graph_limit
+        self.page_size = options.sphinx_doc_page_size
+        self.layout = options.sphinx_doc_layout
+        self.draw_graph = options.sphinx_doc_graph or self.graph_pages
+        self.use_cache = options.sphinx_doc_cache
+        self.workers = options.sphinx_doc_workers
+        self.discovery = options.sphinx_doc_discovery
+        self.renderer = RENDERERS[options.sphinx_doc_format]()
+        #html pages are not built by sphinx, so docstrings are captured
+        self.static_doc = (options.sphinx_doc_static or
+                           options.sphinx_doc_format == 'html')
+        self.json_file = options.sphinx_doc_json
+        self.include_specs = list(options.sphinx_doc_include or ())
+        self.exclude_specs = list(options.sphinx_doc_exclude or ())
+        self.include_filters = [self.compileFilter(spec)
+                                for spec in self.include_specs]
+        self.exclude_filters = [self.compileFilter(spec)
+                                for spec in self.exclude_specs]
+        self.doc_only = options.sphinx_doc_only or self.discovery == 'ast'
+        self.regression_threshold = options.sphinx_doc_regression
+        if options.sphinx_doc_history:
+            self.history_file = HISTORY_FILE.format(
+                os.path.abspath(self.doc_dir_name))
+        #trends of durations are shown in tables of results
+        self.results = bool(options.sphinx_doc_results or self.history_file)
+        if not self.enabled:
+            return
+        self.atomic = options.sphinx_doc_atomic
+        if self.atomic and not hasattr(os, 'symlink'):
+            LOGGER.warning('symbolic links are not supported, documentation'
+                           ' is written directly to output directory')
+            self.atomic = False
+        if self.history_file and sqlite3 is None:
+            LOGGER.warning('sqlite3 is not available, history of test'
+                           ' durations is disabled')
+            self.history_file = None
+        if options.sphinx_doc_profile or options.sphinx_doc_profile_memory:
+            self.enableProfiler(
+                trace_memory=options.sphinx_doc_profile_memory)
+        self.is_worker = getattr(conf, 'worker', False)
+        if self.is_worker:
+            #set by main process, see below; not set if tests are not run
+            self.spool_dir = getattr(options, 'sphinx_doc_spool', None)
+        elif (not self.doc_only and
+                int(getattr(options, 'multiprocess_workers', 0) or 0)):
+            #options are passed to workers of multiprocess plugin,
+            #so they will know where to store collected tests
+            self.spool_dir = tempfile.mkdtemp(prefix='nose_sphinx_doc_')
+            options.sphinx_doc_spool = self.spool_dir
+
+    def loadTestsFromNames(self, names, module=None):
+        if self.discovery != 'ast' or self.is_worker or module is not None:
+            return None
+        #nose loader imports packages given by name right away,
+        #so names are only kept for ast discovery in prepareTest
+        self.test_names = list(names)
+        return [], []
+
+    def prepareTest(self, test):
+        if not self.doc_only or self.is_worker:
+            return None
+        if self.discovery == 'ast':
+            #nothing was loaded, see loadTestsFromNames
+            self.discoverTests()
+        else:
+            self.collectTests(test)
+        self.generateDoc()
+        return unittest.TestSuite()  # nothing to run
+
+    def wantFile(self, file):
+        if self.doc_only and self.manifest:
+            #don't even import modules documented in test cache
+            fname = os.path.abspath(file)
+            module_name = self.cached_sources.get(fname)
+            if module_name is not None:
+                cached = self.manifest[module_name]
+                info = self._sourceInfo(fname, cached)
+                if info and info['hash'] == cached['hash']:
+                    return False
+        return None
 
     def finalize(self, result):
-        test_dict = self.processTests(self.tests)
-        self.genSphinxDoc(test_dict, self.doc_dir_name)
+        if self.is_worker or self.doc_generated:
+            return
+        self.generateDoc()
+
+    def generateDoc(self):
+        """
+        Create documentation of all collected tests.
+        """
+        self.doc_generated = True
+        if self.profiler is not None:
+            self.profiler.memoryPeak('collection')
+            start = time.time()
+        if self.spool_dir:
+            self.mergeSpool(self.spool_dir)
+            shutil.rmtree(self.spool_dir, ignore_errors=True)
+        test_dict = self.test_dict
+        if self.history_file:
+            #only tests run now, before cached ones are added
+            self.updateHistory(test_dict, self.history_file)
+        if self.use_cache:
+            modules = self.updateManifest(self.manifest, test_dict)
+        output_dir = self.doc_dir_name
+        if self.atomic:
+            output_dir = self.startPublish(self.doc_dir_name)
+        generated = False
+        try:
+            self.genSphinxDoc(test_dict, output_dir)
+            if self.use_cache:
+                self.saveManifest(modules,
+                    os.path.join(output_dir, MANIFEST_FILE))
+            if self.profiler is not None:
+                self.profiler.add('generateDoc', time.time() - start)
+                self.profiler.memoryPeak('generation')
+                self.profiler.stopMemory()
+                self.saveProfile(os.path.join(output_dir, PROFILE_FILE))
+            generated = True
+        finally:
+            if self.atomic and not generated:
+                #published documentation is left untouched
+                self._removeTree(output_dir)
+        if self.atomic:
+            self.publish(self.doc_dir_name)
+
+    def _versionDirs(self, doc_dir):
+        """
+        Return directories with versions of documentation.
+
+        :param doc_dir:
+            absolute name of output directory (a symbolic link to one of
+            the versions)
+        :returns:
+            sorted list of (creation time, directory name) tuples
+        """
+        parent, base = os.path.split(doc_dir)
+        prefix = '.{0}.'.format(base)
+        result = []
+        for name in os.listdir(parent):
+            if not name.startswith(prefix):
+                continue
+            try:
+                stamp, pid = name[len(prefix):].rsplit('.', 1)
+                result.append((float(stamp), os.path.join(parent, name)))
+            except ValueError:
+                continue
+        return sorted(result)
+
+    def startPublish(self, doc_dir):
+        """
+        Create staging directory for a new version of documentation.
+
+        Files of the new version with the same content as in the published
+        version are hard links to published files, see :py:meth:`_writeFile`.
+
+        :param doc_dir:
+            output directory
+        :returns:
+            name of staging directory
+        """
+        doc_dir = os.path.abspath(doc_dir)
+        parent, base = os.path.split(doc_dir)
+        staging = os.path.join(parent, '.{0}.{1:.6f}.{2}'.format(base,
+            time.time(), os.getpid()))
+        self._makedirs(staging)
+        self.output_dir = staging
+        self.previous_dir = None
+        if os.path.isdir(doc_dir):
+            self.previous_dir = os.path.realpath(doc_dir)
+        return staging
+
+    def publish(self, doc_dir):
+        """
+        Replace published documentation with staging directory.
+
+        Output directory is a symbolic link, which is atomically replaced
+        by a link to the new version, so readers see either old or new
+        documentation, never a mix. Previous version is kept for readers
+        that still use it, older versions are removed.
+
+        :param doc_dir:
+            output directory
+        """
+        doc_dir = os.path.abspath(doc_dir)
+        parent, base = os.path.split(doc_dir)
+        staging, previous = self.output_dir, self.previous_dir
+        if previous is not None:
+            self._carryOver(previous, staging)
+        if os.path.isdir(doc_dir) and not os.path.islink(doc_dir):
+            #first atomic run, plain directory is moved aside (not atomic)
+            previous = os.path.join(parent, '.{0}.{1:.6f}.{2}'.format(base,
+                0, os.getpid()))
+            os.rename(doc_dir, previous)
+        link = os.path.join(parent, '.{0}.link.{1}'.format(base, os.getpid()))
+        if os.path.lexists(link):
+            os.remove(link)
+        os.symlink(os.path.basename(staging), link)
+        os.rename(link, doc_dir)
+        self.output_dir = self.previous_dir = None
+        if previous is None:
+            return
+        keep = (staging, previous)
+        previous_stamp = dict((name, stamp) for stamp, name
+                              in self._versionDirs(doc_dir)).get(previous)
+        for stamp, name in self._versionDirs(doc_dir):
+            if (name not in keep and previous_stamp is not None and
+                    stamp < previous_stamp):
+                LOGGER.debug('removing old documentation %s', name)
+                self._removeTree(name)
+
+    def _carryOver(self, previous, staging):
+        """
+        Link files not created by the plugin (for example sphinx
+        configuration) from previous version to the new one.
+
+        Directories of other tools (see :py:meth:`_isSkippedDir`) are not
+        carried over: sphinx rewrites its build output in place, which would
+        change linked files of the previous version while it is still read.
+
+        :param previous:
+            directory of previous version
+        :param staging:
+            directory of new version
+        """
+        generated = self._loadGenerated(previous)
+        generated.add(GENERATED_LIST_FILE)
+        for name in self._walkFiles(previous, skip_dirs=True):
+            target = os.path.join(staging, name)
+            if name in generated or os.path.lexists(target):
+                continue
+            if not self._linkFile(os.path.join(previous, name), target):
+                shutil.copy2(os.path.join(previous, name), target)
+
+    def _linkFile(self, source, target):
+        """
+        Create hard link to a file.
+
+        :returns:
+            True if link has been created, False if it is not supported
+        """
+        self._makedirs(os.path.dirname(target))
+        try:
+            os.link(source, target)
+        except (OSError, AttributeError):  # no os.link on windows python 2
+            return False
+        return True
+
+    def _previousFile(self, fname):
+        """
+        Return name of a file in published version of documentation
+        corresponding to a file written to staging directory.
+
+        :param fname:
+            name of written file
+        :returns:
+            file name or None if not publishing or file is outside of
+            staging directory
+        """
+        if self.previous_dir is None:
+            return None
+        relative = os.path.relpath(os.path.abspath(fname), self.output_dir)
+        if relative.startswith(os.pardir):
+            return None
+        return os.path.join(self.previous_dir, relative)
+
+    def enableProfiler(self, trace_memory=False):
+        """
+        Measure time spent in phases of documentation generation.
+
+        Measured methods are replaced by their wrappers in plugin instance.
+
+        :param trace_memory:
+            if True, memory peaks are measured too
+        """
+        profiler = self.profiler = Profiler(trace_memory=trace_memory)
+        for phase, name in [('collect', 'extractTestInfo'),
+                            ('tree', 'testToDict'),
+                            ('discover', 'discoverTests'),
+                            ('merge', 'mergeSpool'),
+                            ('cache', 'updateManifest'),
+                            ('history', 'updateHistory'),
+                            ('publish', 'publish'),
+                            ('stream', '_streamPage'),
+                            ('graph', '_pageGraph'),
+                            ('io', '_writeFile'),
+                            ('io', '_closeStream')]:
+            setattr(self, name, profiler.timed(phase, getattr(self, name)))
+        self._writeFile = profiler.countWrites(self._writeFile)
+        self._closeStream = profiler.countStreams(self._closeStream)
+        self._render_page = profiler.timed('render', self._render_page,
+            key=lambda test_dict, module_path: '.'.join(module_path))
+        self._render_shard = profiler.timed('render', self._render_shard,
+            key=lambda test_dict, module_path, number: '{0}#{1}'.format(
+                '.'.join(module_path), number + 1))
+
+    def saveProfile(self, fname):
+        """
+        Write profiling report as json.
+
+        :param fname:
+            report file name
+        """
+        report = self.profiler.report()
+        report['tests'] = sum(1 for test_info in self._iterTests(self.test_dict))
+        report['pages'] = sum(1 for page in self._iterPages(self.test_dict,
+            self.doc_dir_name, []))
+        report_file = open(fname, 'w')
+        try:
+            json.dump(report, report_file, indent=1, sort_keys=True)
+        finally:
+            report_file.close()
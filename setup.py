@@ -28,7 +28,8 @@ setup(
     zip_safe = False,
     
     entry_points = {
-        'nose.plugins': ['nose_sphinx_doc = nose_sphinx_doc:SphinxDocPlugin']
+        'nose.plugins.0.10': [
+            'nose_sphinx_doc = nose_sphinx_doc:SphinxDocPlugin']
         },
     install_requires = ['nose', 'mock'],
     test_suite = 'nose.collector',
@@ -1,12 +1,22 @@
 import copy
+import json
+import re
 import unittest
 import errno
+import os
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import types
 
 import nose
 from nose.tools import assert_equal, assert_raises
 from mock import Mock, patch
 
-from nose_sphinx_doc import SphinxDocPlugin
+from nose_sphinx_doc import SphinxDocPlugin, CollectedTest, AstCollector, \
+    Profiler, MystRenderer, HtmlRenderer, tracemalloc
 
 
 def _get_test_case_mock(module_name='module'):
@@ -33,52 +43,47 @@ def _get_test_case_info_mock():
     """
     Return mock of test_info structure
     """
-    test_info = {
-        'name': 'test_me',
-        'module': 'module',
-        'test': _get_test_case_mock(),
-        'type': 'TestCase',
-    }
-    return test_info
+    return CollectedTest('module', 'test_me', 'TestCase')
 
 
 def _get_function_test_case_info_mock():
     """
     Return mock of test_info structure
     """
-    test_info = {
-        'name': 'test_me',
-        'module': 'module',
-        'test': _get_function_test_case_mock(),
-        'type': 'FunctionTestCase',
-    }
-    return test_info
+    return CollectedTest('module', 'test_me', 'FunctionTestCase')
 
 
-def test_sphinx_doc_plugin__store_test__single_call():
+@patch('nose_sphinx_doc.SphinxDocPlugin.extractTestInfo')
+def test_sphinx_doc_plugin__store_test__single_call(extractTestInfo):
     """
     Test single call of :py:meth:`.SphinxDocPlugin.storeTest`.
     """
     #test single call
     plugin = SphinxDocPlugin()
-    test = nose.case.Test(lambda x: x)
-    assert_equal(plugin.tests, [])
+    test = _get_test_case_mock()
+    extractTestInfo.return_value = _get_test_case_info_mock()
+    assert_equal(plugin.test_dict, {})
     plugin.storeTest(test)
-    assert_equal(plugin.tests, [test])
+    assert_equal(plugin.test_dict,
+        {'module': {'__tests__': [_get_test_case_info_mock()]}})
+    assert_equal(extractTestInfo.call_args, ((test,), {}))
 
 
-def test_sphinx_doc_plugin__store_test__several_calls():
+@patch('nose_sphinx_doc.SphinxDocPlugin.extractTestInfo')
+def test_sphinx_doc_plugin__store_test__several_calls(extractTestInfo):
     """
     Test several calls to :py:meth:`.SphinxDocPlugin.storeTest`.
     """
     #test double call
     plugin = SphinxDocPlugin()
-    assert_equal(plugin.tests, [])
-    test1 = nose.case.Test(lambda x: x)
-    test2 = nose.case.Test(lambda x: x)
-    plugin.storeTest(test1)
-    plugin.storeTest(test2)
-    assert_equal(plugin.tests, [test1, test2])
+    assert_equal(plugin.test_dict, {})
+    extractTestInfo.side_effect = [_get_test_case_info_mock(),
+        _get_function_test_case_info_mock()]
+    plugin.storeTest(_get_test_case_mock())
+    plugin.storeTest(_get_function_test_case_mock())
+    assert_equal(plugin.test_dict, {'module': {'__tests__': [
+        _get_test_case_info_mock(), _get_function_test_case_info_mock()]}})
+    assert_equal(list(plugin.test_nodes.keys()), ['module'])
 
 
 def test_sphinx_doc_plugin__test_to_dict():
@@ -86,12 +91,7 @@ def test_sphinx_doc_plugin__test_to_dict():
     Test :py:meth:`nose_sphinx_doc.SphinxDocPlugin.testToDict`.
     """
     plugin = SphinxDocPlugin()
-    test_info = {
-        'module': 'sample',
-        'name': 'test_sample',
-        'test': None,
-        'type': 'FunctionTestCase'
-    }
+    test_info = CollectedTest('sample', 'test_sample', 'FunctionTestCase')
     expected_info = copy.deepcopy(test_info)
     expected_dict = {
         'sample': {
@@ -103,6 +103,44 @@ def test_sphinx_doc_plugin__test_to_dict():
     assert_equal(test_dict, expected_dict)
 
 
+def test_sphinx_doc_plugin__test_to_dict__nodes():
+    """
+    Test :py:meth:`.SphinxDocPlugin.testToDict` with cache of module entries.
+    """
+    plugin = SphinxDocPlugin()
+    test1 = CollectedTest('pkg.mod', 'test_a', 'FunctionTestCase')
+    test2 = CollectedTest('pkg.mod', 'test_b', 'FunctionTestCase')
+    test3 = CollectedTest('pkg', 'test_c', 'FunctionTestCase')
+    test_dict = {}
+    nodes = {}
+    plugin.testToDict(test_dict, test1, nodes)
+    assert_equal(nodes, {'pkg.mod': test_dict['pkg']['mod']})
+    plugin.testToDict(test_dict, test2, nodes)
+    plugin.testToDict(test_dict, test3, nodes)
+    assert_equal(test_dict, {'pkg': {
+        '__tests__': [test3],
+        'mod': {'__tests__': [test1, test2]}}})
+    assert_equal(nodes['pkg'], test_dict['pkg'])
+
+
+def test_sphinx_doc_plugin__test_to_dict__shared_source():
+    """
+    Test :py:meth:`.SphinxDocPlugin.testToDict` stores equal doctest
+    sources once.
+    """
+    plugin = SphinxDocPlugin()
+    source = '\n    >>> x = 1\n'
+    tests = [CollectedTest.fromDict(json.loads(json.dumps(CollectedTest(
+        'mod', name, 'DocTestCase', source=source).asDict())))
+        for name in ['f', 'g']]
+    assert_equal(tests[0].source is tests[1].source, False)
+    test_dict = plugin.processTests(tests)
+    first, second = test_dict['mod']['__tests__']
+    assert_equal(first.source, source)
+    assert_equal(first.source is second.source, True)
+    assert_equal(len(plugin.doc_sources), 1)
+
+
 def test_sphinx_doc_plugin__extract_test_info__function():
     """
     Test test data extraction from FunctionTestCase.
@@ -117,12 +155,7 @@ def test_sphinx_doc_plugin__extract_test_info__function():
     test.test.test.__module__ = 'module'
     test.test.test.__name__ = 'name'
 
-    expected_result = {
-        'module': 'module',
-        'name': 'name',
-        'test': test,
-        'type': 'FunctionTestCase',
-    }
+    expected_result = CollectedTest('module', 'name', 'FunctionTestCase')
     test_info = plugin.extractTestInfo(test)
     assert_equal(test_info, expected_result)
 
@@ -139,16 +172,70 @@ def test_sphinx_doc_plugin__extract_test_info__test_case():
     test.test = Mock(unittest.TestCase)
     test.test.__module__ = 'module'
 
-    expected_result = {
-        'module': 'module',
-        'name': 'Mock',
-        'test': test,
-        'type': 'TestCase',
-    }
+    expected_result = CollectedTest('module', 'Mock', 'TestCase')
     test_info = plugin.extractTestInfo(test)
     assert_equal(test_info, expected_result)
 
 
+def test_sphinx_doc_plugin__extract_test_info__doc_test_case():
+    """
+    Test test data extraction from DocTestCase.
+
+    Test :py:meth:`.SphinxDocPlugin.extractTestInfo` for proper info extraction
+    from an instance of :py:class:`nose.plugins.doctests.DocTestCase`.
+    """
+    plugin = SphinxDocPlugin()
+    test = Mock(nose.case.Test)
+    test.test = Mock(nose.plugins.doctests.DocTestCase)
+    test.test.address.return_value = ('module.py', 'module', 'func')
+    test.test.id.return_value = 'module.func'
+    test.test._dt_test = Mock()
+    test.test._dt_test.docstring = '>>> 1\n1\n'
+    test.test._dt_test.lineno = 9
+
+    expected_result = CollectedTest('module', 'func', 'DocTestCase',
+        source='>>> 1\n1\n', lineno=10)
+    test_info = plugin.extractTestInfo(test)
+    assert_equal(test_info, expected_result)
+
+
+def test_sphinx_doc_plugin__extract_test_info__test_case_method():
+    """
+    Test extraction of test method name and line number from a TestCase.
+    """
+    class SampleTest(unittest.TestCase):
+        def test_me(self):
+            pass
+    plugin = SphinxDocPlugin()
+    test = Mock(nose.case.Test)
+    test.test = SampleTest('test_me')
+
+    test_info = plugin.extractTestInfo(test)
+    assert_equal(test_info.name, 'SampleTest')
+    assert_equal(test_info.method, 'test_me')
+    assert_equal(test_info.lineno,
+        SampleTest.test_me.__code__.co_firstlineno)
+
+
+def test_sphinx_doc_plugin__extract_test_info__method_test_case():
+    """
+    Test extraction of test data from a test class not based on TestCase.
+    """
+    class SampleTest(object):
+        def test_me(self):
+            pass
+    plugin = SphinxDocPlugin()
+    test = Mock(nose.case.Test)
+    test.test = Mock(nose.case.MethodTestCase)
+    test.test.cls = SampleTest
+    test.test.method = SampleTest().test_me
+
+    expected_result = CollectedTest(__name__, 'SampleTest', 'TestCase',
+        lineno=SampleTest.test_me.__code__.co_firstlineno, method='test_me',
+        file=plugin._moduleSource(__name__))
+    assert_equal(plugin.extractTestInfo(test), expected_result)
+
+
 def test_sphinx_doc_plugin__extract_test_info__unsupported_type():
     """
     Test  proper exception raising for unsupported data types.
@@ -168,9 +255,7 @@ def test_sphinx_doc_plugin__extract_test_info__unsupported_type():
 
 
 @patch('nose_sphinx_doc.SphinxDocPlugin.testToDict')
-@patch('nose_sphinx_doc.SphinxDocPlugin.extractTestInfo')
-def test_sphinx_doc_plugin__process_tests__empty_list(extractTestInfo,
-                                                        testToDict):
+def test_sphinx_doc_plugin__process_tests__empty_list(testToDict):
     """
     Test :py:meth:`.SphinxDocPlugin.processTests` with empty list.
     """
@@ -179,14 +264,11 @@ def test_sphinx_doc_plugin__process_tests__empty_list(extractTestInfo,
     expected_result = {}
     result = plugin.processTests(test_list)
     assert_equal(result, expected_result)
-    assert_equal(extractTestInfo.call_count, 0)
     assert_equal(testToDict.call_count, 0)
 
 
 @patch('nose_sphinx_doc.SphinxDocPlugin.testToDict')
-@patch('nose_sphinx_doc.SphinxDocPlugin.extractTestInfo')
-def test_sphinx_doc_plugin__process_tests__single_test(extractTestInfo,
-                                                        testToDict):
+def test_sphinx_doc_plugin__process_tests__single_test(testToDict):
     """
     Test :py:meth:`.SphinxDocPlugin.processTests` with single test.
     """
@@ -195,14 +277,11 @@ def test_sphinx_doc_plugin__process_tests__single_test(extractTestInfo,
     expected_result = {}
     result = plugin.processTests(test_list)
     assert_equal(result, expected_result)
-    assert_equal(extractTestInfo.call_count, 1)
     assert_equal(testToDict.call_count, 1)
 
 
 @patch('nose_sphinx_doc.SphinxDocPlugin.testToDict')
-@patch('nose_sphinx_doc.SphinxDocPlugin.extractTestInfo')
-def test_sphinx_doc_plugin__process_tests__several_tests(extractTestInfo,
-                                                        testToDict):
+def test_sphinx_doc_plugin__process_tests__several_tests(testToDict):
     """
     Test :py:meth:`.SphinxDocPlugin.processTests` with several test.
     """
@@ -211,7 +290,6 @@ def test_sphinx_doc_plugin__process_tests__several_tests(extractTestInfo,
     expected_result = {}
     result = plugin.processTests(test_list)
     assert_equal(result, expected_result)
-    assert_equal(extractTestInfo.call_count, len(test_list))
     assert_equal(testToDict.call_count, len(test_list))
 
 
@@ -272,12 +350,7 @@ def test_sphinx_doc_plugin___document_test_case():
     Test :py:meth:`.SphinxDocPlugin._document_test_case`.
     """
     plugin = SphinxDocPlugin()
-    test_info = {
-        'name': 'test_me',
-        'module': 'module',
-        'test': _get_test_case_mock(),
-        'type': 'TestCase',
-    }
+    test_info = _get_test_case_info_mock()
     expected = '    .. autoclass:: module.test_me\n        :members:\n\n'
     assert_equal(plugin._document_test_case(test_info), expected)
 
@@ -287,12 +360,7 @@ def test_sphinx_doc_plugin___document_function_test_case():
     Test :py:meth:`.SphinxDocPlugin._document_funtion_test_case`.
     """
     plugin = SphinxDocPlugin()
-    test_info = {
-        'name': 'test_me',
-        'module': 'module',
-        'test': _get_test_case_mock(),
-        'type': 'FunctionTestCase',
-    }
+    test_info = _get_function_test_case_info_mock()
     expected = '    .. autofunction:: module.test_me\n\n'
     assert_equal(plugin._document_function_test_case(test_info), expected)
 
@@ -348,6 +416,1475 @@ def test_sphinx_doc_plugin___document_tests__function_test_case():
     assert_equal(plugin._document_function_test_case.call_count, 1)
     assert_equal(plugin._document_test_case.call_count, 0)
 
+
+def test_sphinx_doc_plugin___write_file__unchanged():
+    """
+    Test :py:meth:`.SphinxDocPlugin._writeFile` does not rewrite same content.
+    """
+    plugin = SphinxDocPlugin()
+    dirname = tempfile.mkdtemp()
+    try:
+        fname = os.path.join(dirname, 'sub', 'index.rst')
+        assert_equal(plugin._writeFile(fname, 'text\n'), True)
+        assert_equal(plugin._writeFile(fname, 'text\n'), False)
+        assert_equal(plugin._writeFile(fname, 'other\n'), True)
+        assert_equal(open(fname).read(), 'other\n')
+        assert_equal(plugin.generated_files, set([os.path.abspath(fname)]))
+    finally:
+        shutil.rmtree(dirname)
+
+
+def test_sphinx_doc_plugin__gen_sphinx_doc__remove_stale():
+    """
+    Test :py:meth:`.SphinxDocPlugin.genSphinxDoc` removes pages of old modules.
+    """
+    plugin = SphinxDocPlugin()
+    dirname = tempfile.mkdtemp()
+    try:
+        plugin.genSphinxDoc({'a': {}, 'b': {}}, dirname)
+        open(os.path.join(dirname, 'b', 'notes.txt'), 'w').close()
+        plugin.genSphinxDoc({'a': {}}, dirname)
+        assert_equal(os.path.exists(os.path.join(dirname, 'a', 'index.rst')),
+            True)
+        assert_equal(os.path.exists(os.path.join(dirname, 'b', 'index.rst')),
+            False)
+        #files not created by the plugin are left alone
+        assert_equal(os.listdir(os.path.join(dirname, 'b')), ['notes.txt'])
+        os.remove(os.path.join(dirname, 'b', 'notes.txt'))
+        os.rmdir(os.path.join(dirname, 'b'))
+        plugin.genSphinxDoc({'a': {}}, dirname)
+        assert_equal(sorted(os.listdir(dirname)),
+                     ['.generated_files', 'a', 'index.rst'])
+        assert_equal(open(os.path.join(dirname, '.generated_files')).read(),
+                     'a/index.rst\nindex.rst\n')
+    finally:
+        shutil.rmtree(dirname)
+
+
+def test_sphinx_doc_plugin__gen_sphinx_doc__remove_stale_only_generated():
+    """
+    Test :py:meth:`.SphinxDocPlugin.genSphinxDoc` removes only files it
+    created, even if they have the same names as generated files.
+    """
+    plugin = SphinxDocPlugin()
+    dirname = tempfile.mkdtemp()
+    try:
+        built = os.path.join(dirname, '_build', 'html')
+        os.makedirs(built)
+        open(os.path.join(built, 'index.html'), 'w').close()
+        open(os.path.join(dirname, 'regressions.rst'), 'w').close()
+        plugin.genSphinxDoc({'a': {}}, dirname)
+        #even if the list of generated files says otherwise
+        with open(os.path.join(dirname, '.generated_files'), 'a') as fobj:
+            fobj.write('_build/html/index.html\n../outside.rst\n')
+        plugin.genSphinxDoc({}, dirname)
+        assert_equal(os.path.exists(os.path.join(built, 'index.html')), True)
+        assert_equal(os.path.exists(os.path.join(dirname, 'regressions.rst')),
+                     True)
+        assert_equal(os.path.exists(os.path.join(dirname, 'a')), False)
+    finally:
+        shutil.rmtree(dirname)
+
+
+def _make_module(dirname, module_name):
+    """
+    Create source file of a module and register it in ``sys.modules``.
+    """
+    fname = os.path.join(dirname, module_name + '.py')
+    source_file = open(fname, 'w')
+    source_file.write('def test_me():\n    pass\n')
+    source_file.close()
+    module = types.ModuleType(module_name)
+    module.__file__ = fname
+    sys.modules[module_name] = module
+    return fname
+
+
+def test_sphinx_doc_plugin__manifest__store_and_reuse():
+    """
+    Test reuse of cached tests by :py:meth:`.SphinxDocPlugin.updateManifest`.
+    """
+    plugin = SphinxDocPlugin()
+    dirname = tempfile.mkdtemp()
+    try:
+        _make_module(dirname, 'nsd_cached_module')
+        test_info = _get_function_test_case_info_mock()
+        test_info.module = 'nsd_cached_module'
+        test_info.status = 'passed'
+        test_info.duration = 1.5
+        modules = plugin.updateManifest({},
+            {'nsd_cached_module': {'__tests__': [test_info]}})
+        manifest_name = os.path.join(dirname, 'manifest.json')
+        plugin.saveManifest(modules, manifest_name)
+
+        #module was not collected in next run, but did not change
+        test_dict = {}
+        modules = plugin.updateManifest(plugin.loadManifest(manifest_name),
+            test_dict)
+        expected_info = CollectedTest('nsd_cached_module', 'test_me',
+            'FunctionTestCase')
+        assert_equal(test_dict,
+            {'nsd_cached_module': {'__tests__': [expected_info]}})
+        #results of earlier run are not reused
+        assert_equal(test_dict['nsd_cached_module']['__tests__'][0].status,
+            None)
+        assert_equal(test_dict['nsd_cached_module']['__tests__'][0].duration,
+            None)
+        assert_equal(CollectedTest.fromDict(
+            modules['nsd_cached_module']['tests'][0]), expected_info)
+    finally:
+        del sys.modules['nsd_cached_module']
+        shutil.rmtree(dirname)
+
+
+def test_sphinx_doc_plugin__manifest__changed_source():
+    """
+    Test :py:meth:`.SphinxDocPlugin.updateManifest` drops outdated modules.
+    """
+    plugin = SphinxDocPlugin()
+    dirname = tempfile.mkdtemp()
+    try:
+        fname = _make_module(dirname, 'nsd_changed_module')
+        test_info = _get_function_test_case_info_mock()
+        test_info.module = 'nsd_changed_module'
+        modules = plugin.updateManifest({},
+            {'nsd_changed_module': {'__tests__': [test_info]}})
+        source_file = open(fname, 'a')
+        source_file.write('# changed\n')
+        source_file.close()
+
+        test_dict = {}
+        assert_equal(plugin.updateManifest(modules, test_dict), {})
+        assert_equal(test_dict, {})
+    finally:
+        del sys.modules['nsd_changed_module']
+        shutil.rmtree(dirname)
+
+
+def test_sphinx_doc_plugin__load_manifest__other_options():
+    """
+    Test :py:meth:`.SphinxDocPlugin.loadManifest` ignores tests cached
+    with other filters or collection options.
+    """
+    plugin = SphinxDocPlugin()
+    plugin.include_specs = ['pkg.api']
+    plugin.include_filters = [plugin.compileFilter('pkg.api')]
+    dirname = tempfile.mkdtemp()
+    try:
+        _make_module(dirname, 'nsd_filtered_module')
+        test_info = _get_function_test_case_info_mock()
+        test_info.module = 'nsd_filtered_module'
+        modules = plugin.updateManifest({},
+            {'nsd_filtered_module': {'__tests__': [test_info]}})
+        fname = os.path.join(dirname, 'manifest.json')
+        plugin.saveManifest(modules, fname)
+        assert_equal(sorted(plugin.loadManifest(fname)),
+                     ['nsd_filtered_module'])
+
+        #filters are widened, so cached modules may lack selected tests
+        plugin = SphinxDocPlugin()
+        assert_equal(plugin.loadManifest(fname), {})
+        plugin.include_specs = ['pkg.api']
+        plugin.static_doc = True
+        assert_equal(plugin.loadManifest(fname), {})
+    finally:
+        del sys.modules['nsd_filtered_module']
+        shutil.rmtree(dirname)
+
+
+def test_sphinx_doc_plugin__load_manifest__other_version():
+    """
+    Test :py:meth:`.SphinxDocPlugin.loadManifest` ignores other versions.
+    """
+    plugin = SphinxDocPlugin()
+    dirname = tempfile.mkdtemp()
+    try:
+        fname = os.path.join(dirname, 'manifest.json')
+        assert_equal(plugin.loadManifest(fname), {})
+        manifest_file = open(fname, 'w')
+        manifest_file.write('{"version": -1, "modules": {"a": {}}}')
+        manifest_file.close()
+        assert_equal(plugin.loadManifest(fname), {})
+    finally:
+        shutil.rmtree(dirname)
+
+
+def test_sphinx_doc_plugin__gen_sphinx_doc__graph():
+    """
+    Test :py:meth:`.SphinxDocPlugin.genSphinxDoc` with test graph.
+    """
+    plugin = SphinxDocPlugin()
+    plugin.draw_graph = True
+    dirname = tempfile.mkdtemp()
+    try:
+        plugin.genSphinxDoc({'pkg': {'mod': {'__tests__': [
+            _get_function_test_case_info_mock()]}}}, dirname)
+        expected = ('graph {\n'
+            '    label="Tests";\n'
+            '        "pkg" [label="pkg"];\n'
+            '        "pkg.mod" [label="mod"];\n'
+            '        "pkg" -- "pkg.mod";\n'
+            '        "pkg.mod.test_me" [label="test_me"];\n'
+            '        "pkg.mod" -- "pkg.mod.test_me";\n'
+            '}\n')
+        assert_equal(open(os.path.join(dirname, 'tests.dot')).read(),
+            expected)
+        assert_equal(open(os.path.join(dirname, 'index.rst')).read().endswith(
+            '.. graphviz:: tests.dot\n'), True)
+    finally:
+        shutil.rmtree(dirname)
+
+
+def _draw_graph_recursive(test_dict, module_path):
+    """
+    Reference implementation of graph drawing, building text recursively.
+    """
+    lines = []
+    submodules = sorted(test_dict.keys())
+    if '__tests__' in test_dict:
+        submodules.remove('__tests__')
+        for test in test_dict['__tests__']:
+            lines.append('        "{0}.{1}" [label="{1}"];\n'.format(
+                '.'.join(module_path), test.name))
+            lines.append('        "{0}" -- "{0}.{1}";\n'.format(
+                '.'.join(module_path), test.name))
+    for submodule in submodules:
+        node_id = '.'.join(module_path + [submodule])
+        lines.append('        "{0}" [label="{1}"];\n'.format(
+            node_id, submodule))
+        if module_path:
+            lines.append('        "{0}" -- "{1}";\n'.format(
+                '.'.join(module_path), node_id))
+        lines.append(_draw_graph_recursive(test_dict[submodule],
+            module_path + [submodule]))
+    return ''.join(lines)
+
+
+def test_sphinx_doc_plugin__gen_sphinx_doc__graph_streamed():
+    """
+    Test graph written during page traversal is the same as graph
+    drawn by a separate recursive walk, and is not rewritten when unchanged.
+    """
+    tests = [CollectedTest(module, name, 'FunctionTestCase')
+             for module in ['', 'a', 'a.b', 'a.b.c', 'a.d', 'e.f']
+             for name in ['test_1', 'test_2']]
+    plugin = SphinxDocPlugin()
+    plugin.draw_graph = True
+    plugin.workers = 4
+    test_dict = plugin.processTests(tests)
+    expected = ''.join(['graph {\n', '    label="Tests";\n',
+        _draw_graph_recursive(test_dict, []), '}\n'])
+    dirname = tempfile.mkdtemp()
+    try:
+        fname = os.path.join(dirname, 'tests.dot')
+        plugin.genSphinxDoc(test_dict, dirname)
+        assert_equal(open(fname).read(), expected)
+        inode = os.stat(fname).st_ino
+        plugin.genSphinxDoc(test_dict, dirname)
+        assert_equal(os.stat(fname).st_ino, inode)
+        assert_equal(sorted(name for name in os.listdir(dirname)
+                            if name.startswith('.')), ['.generated_files'])
+    finally:
+        shutil.rmtree(dirname)
+
+
+def test_sphinx_doc_plugin__gen_sphinx_doc__graph_pages():
+    """
+    Test :py:meth:`.SphinxDocPlugin.genSphinxDoc` drawing separate
+    graph of limited size on each page.
+    """
+    tests = [CollectedTest(module, 'test_{0}'.format(i), 'FunctionTestCase')
+             for module, count in [('a', 1), ('a.small', 2), ('a.big', 5),
+                                   ('b', 1)]
+             for i in range(count)]
+    plugin = SphinxDocPlugin()
+    plugin.draw_graph = True
+    plugin.graph_pages = True
+    plugin.graph_limit = 6
+    dirname = tempfile.mkdtemp()
+    try:
+        test_dict = plugin.processTests(tests)
+        plugin.genSphinxDoc(test_dict, dirname)
+        assert_equal(open(os.path.join(dirname, 'tests.dot')).read(),
+            'graph {\n'
+            '    label="Tests";\n'
+            '        "a" [label="a (8 tests)", shape=box];\n'
+            '        "b" [label="b"];\n'
+            '        "b.test_0" [label="test_0"];\n'
+            '        "b" -- "b.test_0";\n'
+            '}\n')
+        assert_equal(open(os.path.join(dirname, 'a', 'tests.dot')).read(),
+            'graph {\n'
+            '    label="Tests in a";\n'
+            '        "a" [label="a"];\n'
+            '        "a.test_0" [label="test_0"];\n'
+            '        "a" -- "a.test_0";\n'
+            '        "a.big" [label="big (5 tests)", shape=box];\n'
+            '        "a" -- "a.big";\n'
+            '        "a.small" [label="small"];\n'
+            '        "a" -- "a.small";\n'
+            '        "a.small.test_0" [label="test_0"];\n'
+            '        "a.small" -- "a.small.test_0";\n'
+            '        "a.small.test_1" [label="test_1"];\n'
+            '        "a.small" -- "a.small.test_1";\n'
+            '}\n')
+        plugin.graph_limit = 4
+        assert_equal(plugin._pageGraph(test_dict['a']['big'], ['a', 'big']),
+            'graph {\n'
+            '    label="Tests in a.big";\n'
+            '        "a.big" [label="big"];\n'
+            '        "a.big.__tests__" [label="5 tests", shape=box];\n'
+            '        "a.big" -- "a.big.__tests__";\n'
+            '}\n')
+        for module_dir in ['a', 'b', os.path.join('a', 'big')]:
+            assert_equal(open(os.path.join(dirname, module_dir,
+                'index.rst')).read().endswith('.. graphviz:: tests.dot\n'),
+                True)
+    finally:
+        shutil.rmtree(dirname)
+
+
+def test_sphinx_doc_plugin__count_tests():
+    """
+    Test :py:meth:`.SphinxDocPlugin.countTests`.
+    """
+    plugin = SphinxDocPlugin()
+    test_dict = plugin.processTests([
+        CollectedTest('a', 'Test', 'TestCase', method='test_me'),
+        CollectedTest('a.b', 'test_1', 'FunctionTestCase'),
+        CollectedTest('a.b.c', 'test_2', 'FunctionTestCase'),
+        CollectedTest('d', 'func', 'DocTestCase'),
+    ])
+    plugin.countTests(test_dict)
+    assert_equal(test_dict['__counts__'], {'total': 4, 'modules': 5,
+        'TestCase': 1, 'FunctionTestCase': 2, 'DocTestCase': 1})
+    assert_equal(test_dict['a']['b']['__counts__'], {'total': 2,
+        'modules': 2, 'TestCase': 0, 'FunctionTestCase': 2, 'DocTestCase': 0})
+    assert_equal(plugin._submodules(test_dict['a']), ['b'])
+    assert_equal(len(list(plugin._iterTests(test_dict))), 4)
+    assert_equal(plugin._countText(test_dict['d']),
+        '1 test: 1 DocTestCase')
+    lines = plugin._render_page(test_dict['a'], ['a']).splitlines()
+    assert_equal(lines[3], '    Tests in ``a`` (3 tests: 1 TestCase,'
+        ' 2 FunctionTestCase):')
+    assert_equal('    b (2)<./b/index>' in lines, True)
+
+
+def test_sphinx_doc_plugin___iter_pages__deep():
+    """
+    Test :py:meth:`.SphinxDocPlugin._iterPages`, generation of pages
+    and graph, and walks over output directory on module tree deeper than
+    recursion limit.
+    """
+    depth = sys.getrecursionlimit() + 100
+    module = '.'.join('m' for i in range(depth))
+    plugin = SphinxDocPlugin()
+    plugin.draw_graph = True
+    test_dict = plugin.processTests([
+        CollectedTest(module, 'test_me', 'FunctionTestCase'),
+        CollectedTest('m.n', 'test_me', 'FunctionTestCase')])
+    plugin.countTests(test_dict)
+    assert_equal(test_dict['__counts__']['modules'], depth + 2)
+    pages = list(plugin._iterPages(test_dict, 'doc', []))
+    assert_equal(len(pages), depth + 2)
+    assert_equal((pages[1][1].dirname(), pages[1][1].modules()),
+                 (os.path.join('doc', 'm'), ['m']))
+    assert_equal(pages[-2][1].modules(), module.split('.'))
+    assert_equal((pages[-1][1].dirname(), pages[-1][1].modules()),
+                 (os.path.join('doc', 'm', 'n'), ['m', 'n']))
+    #paths of submodules are shared, not copied
+    assert_equal(pages[-2][1].parent is pages[-3][1], True)
+    assert_equal(pages[-1][1].parent is pages[1][1], True)
+    dirname = tempfile.mkdtemp()
+    staging = tempfile.mkdtemp()
+    try:
+        plugin.genSphinxDoc(test_dict, dirname)
+        assert_equal(open(os.path.join(dirname, 'tests.dot')).read().count(
+            ' -- '), depth + 2)
+        deepest = os.path.join(*[dirname] + module.split('.'))
+        assert_equal(os.path.exists(os.path.join(deepest, 'index.rst')), True)
+        #files not created by the plugin are carried over to a new version
+        open(os.path.join(deepest, 'notes.txt'), 'w').close()
+        plugin._carryOver(dirname, staging)
+        assert_equal(list(plugin._walkFiles(staging)),
+            [os.path.join(*module.split('.') + ['notes.txt'])])
+        os.remove(os.path.join(deepest, 'notes.txt'))
+        #graph of a single page does not depend on depth of the tree
+        assert_equal(plugin._pageGraph(test_dict, []).count(' -- '), 0)
+        #and stale pages are removed without recursion
+        plugin.genSphinxDoc(plugin.processTests([]), dirname)
+        assert_equal(sorted(os.listdir(dirname)),
+                     ['.generated_files', 'index.rst', 'tests.dot'])
+    finally:
+        plugin._removeTree(dirname)
+        plugin._removeTree(staging)
+    assert_equal(os.path.exists(staging), False)
+
+
+def test_sphinx_doc_plugin___document_tests__layout():
+    """
+    Test :py:meth:`.SphinxDocPlugin._document_tests` with different layouts
+    of autodoc directives.
+    """
+    plugin = SphinxDocPlugin()
+    tests = [CollectedTest('pkg.mod', 'Test', 'TestCase', method='test_a'),
+             CollectedTest('pkg.mod', 'Test', 'TestCase', method='test_b'),
+             CollectedTest('pkg.mod', 'test_c', 'FunctionTestCase')]
+    header = ('---------------\n'
+              'Available tests\n'
+              '---------------\n')
+    assert_equal(plugin._document_tests(tests), header +
+        '    .. autoclass:: pkg.mod.Test\n'
+        '        :members:\n\n'
+        '    .. autoclass:: pkg.mod.Test\n'
+        '        :members:\n\n'
+        '    .. autofunction:: pkg.mod.test_c\n\n'
+        '\n')
+    plugin.layout = 'grouped'
+    grouped = (header +
+        '    .. currentmodule:: pkg.mod\n\n'
+        '    .. autoclass:: Test\n'
+        '        :members:\n\n'
+        '    .. autofunction:: test_c\n\n'
+        '\n')
+    assert_equal(plugin._document_tests(tests), grouped)
+    plugin.layout = 'auto'
+    assert_equal(plugin._document_tests(tests), grouped)
+    assert_equal(plugin._layout(tests[:2]), 'full')
+    assert_equal(plugin._layout(tests[1:]), 'grouped')
+
+
+def _lstrip_common_spaces_regex(lines):
+    """
+    Reference implementation of common indentation removal with regular
+    expressions, valid for lines that all start with a space.
+    """
+    space_counters = [len(re.findall(r'^ +', line)[0])
+                      for line in lines if len(line) > 0]
+    if space_counters:
+        min_val = min(space_counters)
+        if min_val > 0:
+            return [re.sub('^\\ {{{0}}}'.format(min_val), '', line, count=1)
+                    for line in lines]
+    return lines
+
+
+def test_sphinx_doc_plugin___lstrip_common_spaces__random():
+    """
+    Test :py:meth:`.SphinxDocPlugin._lstrip_common_spaces` gives the same
+    result as regular expressions on random indented text.
+    """
+    plugin = SphinxDocPlugin()
+    rnd = random.Random(15)
+    for _i in range(500):
+        lines = []
+        for _j in range(rnd.randint(0, 10)):
+            if rnd.random() < 0.2:
+                lines.append(' ' * rnd.randint(0, 3))
+            else:
+                lines.append(' ' * rnd.randint(1, 12) +
+                    rnd.choice(['>>> x = 1', '... pass', 'a  b ', '1']))
+        assert_equal(plugin._lstrip_common_spaces(lines),
+            _lstrip_common_spaces_regex(lines))
+
+
+def test_sphinx_doc_plugin___document_doc_test_case():
+    """
+    Test :py:meth:`.SphinxDocPlugin._document_doc_test_case` with
+    tabs and lines that are not indented.
+    """
+    plugin = SphinxDocPlugin()
+    header = ('    Doctest in mod.func:\n'
+              '        .. code-block:: python\n'
+              '\n')
+    assert_equal(plugin._document_doc_test_case(CollectedTest('mod', 'func',
+        'DocTestCase', source='\t>>> if x:\n\t...     pass\n')),
+        header +
+        '            >>> if x:\n'
+        '            ...     pass\n'
+        '            \n'
+        '        \n')
+    assert_equal(plugin._document_doc_test_case(CollectedTest('mod', 'func',
+        'DocTestCase', source='>>> x = 1\n    >>> y = 2')),
+        header +
+        '            >>> x = 1\n'
+        '                >>> y = 2\n'
+        '        \n')
+    #docstrings usually start with empty line, which separates the code
+    assert_equal(plugin._document_doc_test_case(CollectedTest('mod', 'func',
+        'DocTestCase', source='\n    >>> x = 1\n')),
+        header[:-1] +
+        '            \n'
+        '            >>> x = 1\n'
+        '            \n'
+        '        \n')
+
+
+def test_sphinx_doc_plugin__gen_sphinx_doc__json():
+    """
+    Test :py:meth:`.SphinxDocPlugin.genSphinxDoc` exporting inventory
+    of tests.
+    """
+    plugin = SphinxDocPlugin()
+    plugin.draw_graph = True
+    dirname = tempfile.mkdtemp()
+    try:
+        plugin.json_file = os.path.join(dirname, 'tests.jsonl')
+        test_dict = plugin.processTests([
+            CollectedTest('pkg.b', 'test_b', 'FunctionTestCase', lineno=3,
+                file='/src/pkg/b.py'),
+            CollectedTest('pkg.a', 'Test', 'TestCase', lineno=7,
+                method='test_a', file='/src/pkg/a.py'),
+        ])
+        plugin.genSphinxDoc(test_dict, os.path.join(dirname, 'doc'))
+        records = [json.loads(line)
+                   for line in open(plugin.json_file).read().splitlines()]
+        assert_equal(records, [
+            {'module': 'pkg.a', 'name': 'Test', 'method': 'test_a',
+             'type': 'TestCase', 'file': '/src/pkg/a.py', 'line': 7},
+            {'module': 'pkg.b', 'name': 'test_b', 'method': None,
+             'type': 'FunctionTestCase', 'file': '/src/pkg/b.py', 'line': 3},
+        ])
+        assert_equal(os.path.exists(os.path.join(dirname, 'doc',
+            'tests.dot')), True)
+        assert_equal(sorted(os.listdir(dirname)), ['doc', 'tests.jsonl'])
+    finally:
+        shutil.rmtree(dirname)
+
+
+def test_sphinx_doc_plugin__gen_sphinx_doc__formats():
+    """
+    Test :py:meth:`.SphinxDocPlugin.genSphinxDoc` writing pages in MyST
+    and html, and removing pages of previous format.
+    """
+    plugin = SphinxDocPlugin()
+    plugin.static_doc = True
+    plugin.results = True
+    test_info = CollectedTest('pkg.mod', 'test_me', 'FunctionTestCase',
+        status='failed', duration=0.5, doc=('(a)', 'Check a < b.', ()))
+    test_dict = plugin.processTests([test_info])
+    dirname = tempfile.mkdtemp()
+    try:
+        plugin.genSphinxDoc(test_dict, dirname)
+        plugin.renderer = MystRenderer()
+        plugin.genSphinxDoc(test_dict, dirname)
+        assert_equal(sorted(os.listdir(dirname)),
+                     ['.generated_files', 'index.md', 'pkg'])
+        lines = open(os.path.join(dirname, 'pkg', 'mod',
+                                  'index.md')).read().splitlines()
+        assert_equal(lines[:3], ['# mod', '',
+            'Tests in `pkg.mod` (1 test: 1 FunctionTestCase):'])
+        assert_equal(lines[lines.index('```{eval-rst}') + 1],
+            '    .. py:function:: pkg.mod.test_me(a)')
+        assert_equal('* - `test_me`' in lines, True)
+        assert_equal(open(os.path.join(dirname, 'index.md')).read().split(
+            '```{toctree}\n')[1], ':maxdepth: 1\n\npkg (1)<./pkg/index>\n'
+            '```\n\n## Slowest tests\n\n```{list-table}\n'
+            ':header-rows: 1\n\n* - Test\n  - Status\n  - Duration [s]\n'
+            '* - `pkg.mod.test_me`\n  - **failed**\n  - 0.500\n```\n\n')
+
+        plugin.renderer = HtmlRenderer()
+        plugin.genSphinxDoc(test_dict, dirname)
+        assert_equal(sorted(os.listdir(dirname)),
+                     ['.generated_files', 'index.html', 'pkg'])
+        page = open(os.path.join(dirname, 'pkg', 'mod', 'index.html')).read()
+        assert_equal(page.startswith('<!DOCTYPE html>'), True)
+        assert_equal('<title>mod</title>' in page, True)
+        assert_equal('<dt><code>pkg.mod.test_me(a)</code></dt>\n'
+            '<dd>\n<pre>Check a &lt; b.</pre>\n</dd>' in page, True)
+        assert_equal('<tr><td><code>test_me</code></td>'
+            '<td><strong>failed</strong></td><td>0.500</td></tr>' in page, True)
+        page = open(os.path.join(dirname, 'index.html')).read()
+        assert_equal('<li><a href="./pkg/index.html">pkg (1)</a></li>'
+                     in page, True)
+    finally:
+        shutil.rmtree(dirname)
+
+
+def test_sphinx_doc_plugin__gen_sphinx_doc__page_size():
+    """
+    Test :py:meth:`.SphinxDocPlugin.genSphinxDoc` splitting tests of a big
+    module into several pages, and removing them when no longer needed.
+    """
+    plugin = SphinxDocPlugin()
+    plugin.page_size = 2
+    test_dict = plugin.processTests([
+        CollectedTest('mod', 'test_{0}'.format(i), 'FunctionTestCase')
+        for i in range(5)])
+    dirname = tempfile.mkdtemp()
+    try:
+        plugin.genSphinxDoc(test_dict, dirname)
+        moddir = os.path.join(dirname, 'mod')
+        assert_equal(sorted(os.listdir(moddir)), ['index.rst',
+            'tests_001.rst', 'tests_002.rst', 'tests_003.rst'])
+        index = open(os.path.join(moddir, 'index.rst')).read()
+        assert_equal('autofunction' in index, False)
+        assert_equal(index.endswith(
+            '    Tests 1-2<./tests_001>\n'
+            '    Tests 3-4<./tests_002>\n'
+            '    Tests 5-5<./tests_003>\n\n'), True)
+        assert_equal(open(os.path.join(moddir, 'tests_003.rst')).read(),
+            '==============\n'
+            'mod: tests 5-5\n'
+            '==============\n'
+            '---------------\n'
+            'Available tests\n'
+            '---------------\n'
+            '    .. autofunction:: mod.test_4\n'
+            '\n\n')
+        plugin.page_size = 0
+        plugin.genSphinxDoc(test_dict, dirname)
+        assert_equal(os.listdir(moddir), ['index.rst'])
+    finally:
+        shutil.rmtree(dirname)
+
+
+def test_sphinx_doc_plugin__generate_doc__atomic():
+    """
+    Test :py:meth:`.SphinxDocPlugin.generateDoc` publishing documentation
+    by replacing a symbolic link.
+    """
+    dirname = tempfile.mkdtemp()
+    try:
+        doc_dir = os.path.join(dirname, 'doc')
+        os.makedirs(os.path.join(doc_dir, 'a'))
+        open(os.path.join(doc_dir, 'conf.py'), 'w').close()
+        open(os.path.join(doc_dir, 'a', 'index.rst'), 'w').close()
+        with open(os.path.join(doc_dir, '.generated_files'), 'w') as fobj:
+            fobj.write('a/index.rst\n')
+        #sphinx output rewritten in place is not shared between versions
+        for build_dir in ['_build', '.doctrees']:
+            os.makedirs(os.path.join(doc_dir, build_dir))
+            open(os.path.join(doc_dir, build_dir, 'index.html'), 'w').close()
+
+        def generate(tests):
+            plugin = SphinxDocPlugin()
+            plugin.atomic = True
+            plugin.doc_dir_name = doc_dir
+            for test_info in tests:
+                plugin.testToDict(plugin.test_dict, test_info)
+            plugin.generateDoc()
+            return os.path.realpath(doc_dir)
+
+        test_a = CollectedTest('a', 'test_a', 'FunctionTestCase')
+        test_b = CollectedTest('b', 'test_b', 'FunctionTestCase')
+        first = generate([test_b])
+        assert_equal(os.path.islink(doc_dir), True)
+        #user files are kept, stale generated files are not
+        assert_equal(sorted(os.listdir(doc_dir)),
+                     ['.generated_files', 'b', 'conf.py', 'index.rst'])
+        second = generate([test_b, test_a])
+        assert_equal(first != second, True)
+        assert_equal(os.path.samefile(os.path.join(first, 'b', 'index.rst'),
+            os.path.join(second, 'b', 'index.rst')), True)
+        assert_equal(os.path.samefile(os.path.join(first, 'index.rst'),
+            os.path.join(second, 'index.rst')), False)
+        third = generate([test_b, test_a])
+        assert_equal(sorted(os.listdir(dirname)), sorted(['doc',
+            os.path.basename(second), os.path.basename(third)]))
+
+        plugin = SphinxDocPlugin()
+        plugin.atomic = True
+        plugin.doc_dir_name = doc_dir
+        plugin.genSphinxDoc = Mock(side_effect=IOError)
+        try:
+            plugin.generateDoc()
+        except IOError:
+            pass
+        assert_equal(os.path.realpath(doc_dir), third)
+        assert_equal(len(os.listdir(dirname)), 3)
+    finally:
+        shutil.rmtree(dirname)
+
+
+def _read_tree(dirname):
+    """
+    Return dictionary mapping relative file names to their content.
+    """
+    result = {}
+    for path, dirs, files in os.walk(dirname):
+        for fname in files:
+            full_name = os.path.join(path, fname)
+            result[os.path.relpath(full_name, dirname)] = open(full_name).read()
+    return result
+
+
+def test_sphinx_doc_plugin__gen_sphinx_doc__workers():
+    """
+    Test :py:meth:`.SphinxDocPlugin.genSphinxDoc` gives same output
+    with several workers.
+    """
+    tests = []
+    for i in range(5):
+        for j in range(5):
+            module = 'pkg{0}.mod{1}'.format(i, j)
+            tests.append(CollectedTest(module, 'test_me', 'FunctionTestCase'))
+            tests.append(CollectedTest(module, 'MyTest', 'TestCase'))
+    serial = SphinxDocPlugin()
+    parallel = SphinxDocPlugin()
+    parallel.workers = 4
+    serial_dir = tempfile.mkdtemp()
+    parallel_dir = tempfile.mkdtemp()
+    try:
+        serial.genSphinxDoc(serial.processTests(tests), serial_dir)
+        parallel.genSphinxDoc(parallel.processTests(tests), parallel_dir)
+        serial_tree = _read_tree(serial_dir)
+        assert_equal(len(serial_tree), 32)
+        assert_equal(_read_tree(parallel_dir), serial_tree)
+    finally:
+        shutil.rmtree(serial_dir)
+        shutil.rmtree(parallel_dir)
+
+
+@patch('nose_sphinx_doc.SphinxDocPlugin.extractTestInfo')
+def test_sphinx_doc_plugin__spool(extractTestInfo):
+    """
+    Test merging of tests collected by worker processes.
+
+    Test :py:meth:`.SphinxDocPlugin.storeTest` in a worker of multiprocess
+    plugin and :py:meth:`.SphinxDocPlugin.mergeSpool`.
+    """
+    spool_dir = tempfile.mkdtemp()
+    try:
+        worker = SphinxDocPlugin()
+        worker.is_worker = True
+        worker.spool_dir = spool_dir
+        extractTestInfo.side_effect = [_get_test_case_info_mock(),
+            _get_function_test_case_info_mock()]
+        worker.storeTest(_get_test_case_mock())
+        worker.storeTest(_get_function_test_case_mock())
+        assert_equal(worker.test_dict, {})
+        worker.spool_file.close()
+        #another worker, whose spool file comes first
+        spool_file = open(os.path.join(spool_dir, '0.jsonl'), 'w')
+        spool_file.write(json.dumps(CollectedTest('module', 'test_first',
+            'FunctionTestCase', lineno=1).asDict()) + '\n')
+        spool_file.close()
+
+        plugin = SphinxDocPlugin()
+        plugin.mergeSpool(spool_dir)
+        #order does not depend on workers, it is the order of nose loader
+        assert_equal(plugin.test_dict, {'module': {'__tests__': [
+            _get_test_case_info_mock(), _get_function_test_case_info_mock(),
+            CollectedTest('module', 'test_first', 'FunctionTestCase',
+                          lineno=1)]}})
+        tests = [CollectedTest('module', 'func', 'DocTestCase'),
+                 CollectedTest('module', 'test_b', 'FunctionTestCase',
+                               lineno=3),
+                 CollectedTest('module', 'test_a', 'FunctionTestCase',
+                               lineno=5),
+                 CollectedTest('module', 'TestZ', 'TestCase', method='test_a'),
+                 CollectedTest('module', 'TestA', 'TestCase', method='test_b'),
+                 CollectedTest('module', 'TestA', 'TestCase', method='test_a')]
+        assert_equal([test_info.label() for test_info in
+                      sorted(tests, key=plugin._loaderOrder)],
+                     ['TestA.test_a', 'TestA.test_b', 'TestZ.test_a',
+                      'test_b', 'test_a', 'func'])
+    finally:
+        worker.spool_file.close()
+        shutil.rmtree(spool_dir)
+
+
+@patch('nose_sphinx_doc.SphinxDocPlugin.extractTestInfo')
+def test_sphinx_doc_plugin__test_results(extractTestInfo):
+    """
+    Test recording of status and duration of tests when they are run.
+    """
+    from nose.plugins.skip import SkipTest
+    plugin = SphinxDocPlugin()
+    plugin.results = True
+    infos = [CollectedTest('module', 'test_{0}'.format(i), 'FunctionTestCase')
+             for i in range(5)]
+    extractTestInfo.side_effect = infos
+    tests = [_get_function_test_case_mock() for i in range(5)]
+    results = [lambda test: plugin.addSuccess(test),
+               lambda test: plugin.addFailure(test, (AssertionError, None, None)),
+               lambda test: plugin.addError(test, (ValueError, None, None)),
+               lambda test: plugin.addError(test, (SkipTest, None, None)),
+               lambda test: None]  # handled by other plugin
+    for test, add_result in zip(tests, results):
+        plugin.prepareTestCase(test)
+        plugin.startTest(test)
+        add_result(test)
+        plugin.stopTest(test)
+    assert_equal([test_info.status for test_info in infos],
+        ['passed', 'failed', 'error', 'skipped', 'skipped'])
+    assert_equal(all(test_info.duration >= 0 for test_info in infos), True)
+    assert_equal(plugin.test_dict, {'module': {'__tests__': infos}})
+    assert_equal(plugin.running, {})
+    #results of other tests are ignored
+    plugin.addSuccess(_get_function_test_case_mock())
+    plugin.stopTest(_get_function_test_case_mock())
+
+
+@patch('nose_sphinx_doc.SphinxDocPlugin._extractTestInfo')
+def test_sphinx_doc_plugin__filters(_extractTestInfo):
+    """
+    Test tests excluded by filters are neither stored nor followed.
+    """
+    plugin = SphinxDocPlugin()
+    plugin.include_filters = [plugin.compileFilter(spec)
+                              for spec in ['pkg.api', 'name:_smoke$']]
+    plugin.exclude_filters = [plugin.compileFilter('type:DocTestCase')]
+    tests = [CollectedTest('pkg.api', 'test_a', 'FunctionTestCase'),
+             CollectedTest('pkg.api.v1', 'Test', 'TestCase', method='test_b'),
+             CollectedTest('pkg.api', 'func', 'DocTestCase'),
+             CollectedTest('pkg.apis', 'test_c', 'FunctionTestCase'),
+             CollectedTest('pkg.core', 'test_smoke', 'FunctionTestCase')]
+    assert_equal([plugin.isSelected(test_info) for test_info in tests],
+        [True, True, False, False, True])
+    _extractTestInfo.side_effect = [(test_info, None) for test_info in tests]
+    for _test_info in tests:
+        test = _get_function_test_case_mock()
+        plugin.prepareTestCase(test)
+        plugin.addSuccess(test)
+        plugin.stopTest(test)
+    assert_equal(sorted(test_info.fullName()
+                        for test_info in plugin._iterTests(plugin.test_dict)),
+        ['pkg.api.test_a', 'pkg.api.v1.Test.test_b', 'pkg.core.test_smoke'])
+    assert_equal(tests[3].status, None)
+    assert_equal(plugin.running, {})
+    assert_raises(ValueError, plugin.compileFilter, 'type:Test')
+    assert_raises(ValueError, plugin.compileFilter, 'file:*.py')
+
+
+@patch('nose_sphinx_doc.SphinxDocPlugin.extractTestInfo')
+def test_sphinx_doc_plugin__test_results__worker(extractTestInfo):
+    """
+    Test worker of multiprocess plugin spools tests with their results.
+    """
+    spool_dir = tempfile.mkdtemp()
+    try:
+        worker = SphinxDocPlugin()
+        worker.is_worker = True
+        worker.spool_dir = spool_dir
+        worker.results = True
+        extractTestInfo.return_value = _get_function_test_case_info_mock()
+        test = _get_function_test_case_mock()
+        worker.prepareTestCase(test)
+        worker.startTest(test)
+        assert_equal(worker.spool_file, None)
+        worker.addFailure(test, (AssertionError, None, None))
+        worker.stopTest(test)
+
+        plugin = SphinxDocPlugin()
+        plugin.mergeSpool(spool_dir)
+        test_info = plugin.test_dict['module']['__tests__'][0]
+        assert_equal(test_info.status, 'failed')
+        assert_equal(test_info.duration is not None, True)
+    finally:
+        worker.spool_file.close()
+        shutil.rmtree(spool_dir)
+
+
+def test_sphinx_doc_plugin___render_page__results():
+    """
+    Test :py:meth:`.SphinxDocPlugin._render_page` with results of tests.
+    """
+    plugin = SphinxDocPlugin()
+    test_dict = plugin.processTests([
+        CollectedTest('a', 'test_1', 'FunctionTestCase', status='passed',
+            duration=0.5),
+        CollectedTest('a.b', 'Test', 'TestCase', method='test_2',
+            status='failed', duration=2.0),
+        CollectedTest('a.b', 'test_3', 'FunctionTestCase'),
+    ])
+    plugin.countTests(test_dict)
+    assert_equal([test_info.label() for test_info in test_dict['__slowest__']],
+        ['Test.test_2', 'test_1'])
+    #results are shown only on request
+    page = plugin._render_page(test_dict['a']['b'], ['a', 'b'])
+    assert_equal('Test results' in page, False)
+    plugin.results = True
+    page = plugin._render_page(test_dict['a']['b'], ['a', 'b'])
+    assert_equal(page[page.index('Test results'):], 'Test results\n'
+        '------------\n'
+        '.. list-table::\n'
+        '    :header-rows: 1\n'
+        '\n'
+        '    * - Test\n'
+        '      - Status\n'
+        '      - Duration [s]\n'
+        '    * - ``Test.test_2``\n'
+        '      - **failed**\n'
+        '      - 2.000\n'
+        '    * - ``test_3``\n'
+        '      - not run\n'
+        '      - \n'
+        '\n')
+    #slowest tests are listed on pages of modules with submodules,
+    #elsewhere they would repeat the table of results
+    slowest = ('Slowest tests\n'
+        '-------------\n'
+        '.. list-table::\n'
+        '    :header-rows: 1\n'
+        '\n'
+        '    * - Test\n'
+        '      - Status\n'
+        '      - Duration [s]\n'
+        '    * - ``a.b.Test.test_2``\n'
+        '      - **failed**\n'
+        '      - 2.000\n'
+        '    * - ``a.test_1``\n'
+        '      - passed\n'
+        '      - 0.500\n'
+        '\n')
+    for module_path in [[], ['a']]:
+        page = plugin._render_page(
+            test_dict['a'] if module_path else test_dict, module_path)
+        assert_equal(page[page.index('Slowest tests'):], slowest)
+
+
+def test_sphinx_doc_plugin__update_history():
+    """
+    Test :py:meth:`.SphinxDocPlugin.updateHistory` over several runs.
+    """
+    dirname = tempfile.mkdtemp()
+    try:
+        fname = os.path.join(dirname, 'doc.history.sqlite')
+        plugin = SphinxDocPlugin()
+        for durations in [(1.0, 0.1), (1.0, 0.1), (1.2, 0.3)]:
+            test_dict = plugin.processTests([
+                CollectedTest('mod', 'test_a', 'FunctionTestCase',
+                    status='passed', duration=durations[0]),
+                CollectedTest('mod', 'Test', 'TestCase', method='test_b',
+                    status='passed', duration=durations[1]),
+                CollectedTest('mod', 'test_c', 'FunctionTestCase'),
+            ])
+            plugin.updateHistory(test_dict, fname)
+        assert_equal(plugin.history, {'mod.test_a': [1.0, 1.0, 1.2],
+                                      'mod.Test.test_b': [0.1, 0.1, 0.3]})
+        assert_equal([(test_info.fullName(), baseline)
+                      for test_info, baseline in plugin.regressions],
+                     [('mod.Test.test_b', 0.1)])
+        test_info = test_dict['mod']['__tests__'][1]
+        assert_equal(plugin._trend(test_info),
+            u'\u2581\u2581\u2588 +200%')
+        assert_equal(plugin._trend(test_dict['mod']['__tests__'][2]), '')
+        assert_equal(plugin._render_regressions().splitlines()[-5:], [
+            '    * - ``mod.Test.test_b``',
+            '      - 0.100',
+            '      - 0.300',
+            '      - +200%',
+            ''])
+        connection = sqlite3.connect(fname)
+        try:
+            assert_equal(connection.execute(
+                'SELECT COUNT(*) FROM durations').fetchone(), (6,))
+        finally:
+            connection.close()
+    finally:
+        shutil.rmtree(dirname)
+
+
+def test_sphinx_doc_plugin__update_history__same_names():
+    """
+    Test :py:meth:`.SphinxDocPlugin.updateHistory` with several tests
+    of the same name, like tests yielded by a test generator.
+    """
+    dirname = tempfile.mkdtemp()
+    try:
+        fname = os.path.join(dirname, 'doc.history.sqlite')
+        plugin = SphinxDocPlugin()
+        for run in range(2):
+            test_dict = plugin.processTests([
+                CollectedTest('mod', 'test_gen', 'FunctionTestCase',
+                    status='passed', duration=duration)
+                for duration in [0.1, 0.2, 0.3]])
+            plugin.updateHistory(test_dict, fname)
+        assert_equal([round(value, 6)
+                      for value in plugin.history['mod.test_gen']], [0.6, 0.6])
+        assert_equal([test_info.duration
+                      for test_info in test_dict['mod']['__tests__']],
+                     [0.1, 0.2, 0.3])
+        connection = sqlite3.connect(fname)
+        try:
+            assert_equal(connection.execute(
+                'SELECT COUNT(*) FROM tests').fetchone(), (1,))
+            assert_equal(connection.execute(
+                'SELECT COUNT(*) FROM durations').fetchone(), (2,))
+        finally:
+            connection.close()
+    finally:
+        shutil.rmtree(dirname)
+
+
+def test_sphinx_doc_plugin__configure__multiprocess():
+    """
+    Test :py:meth:`.SphinxDocPlugin.configure` passes spool dir to workers.
+    """
+    def make_options(doc_only):
+        options = Mock()
+        options.sphinx_doc = True
+        options.multiprocess_workers = 2
+        options.sphinx_doc_workers = 1
+        options.sphinx_doc_only = doc_only
+        options.sphinx_doc_discovery = 'nose'
+        options.sphinx_doc_profile = False
+        options.sphinx_doc_profile_memory = False
+        options.sphinx_doc_graph_pages = False
+        options.sphinx_doc_history = False
+        options.sphinx_doc_results = False
+        options.sphinx_doc_atomic = False
+        options.sphinx_doc_format = 'rst'
+        options.sphinx_doc_include = None
+        options.sphinx_doc_exclude = None
+        del options.sphinx_doc_spool  # set by configure only
+        return options
+
+    #workers have nothing to store when tests are only documented
+    options = make_options(True)
+    conf = Mock()
+    conf.worker = False
+    plugin = SphinxDocPlugin()
+    plugin.can_configure = True
+    plugin.configure(options, conf)
+    assert_equal(plugin.spool_dir, None)
+    conf.worker = True
+    worker = SphinxDocPlugin()
+    worker.can_configure = True
+    worker.configure(options, conf)
+    assert_equal(worker.spool_dir, None)
+    worker.storeTest(_get_function_test_case_mock())
+    assert_equal((worker.test_dict, worker.spool_file), ({}, None))
+
+    options = make_options(False)
+    conf = Mock()
+    conf.worker = False
+    plugin = SphinxDocPlugin()
+    plugin.can_configure = True
+    plugin.configure(options, conf)
+    try:
+        assert_equal(os.path.isdir(plugin.spool_dir), True)
+        assert_equal(options.sphinx_doc_spool, plugin.spool_dir)
+
+        conf.worker = True
+        worker = SphinxDocPlugin()
+        worker.can_configure = True
+        worker.configure(options, conf)
+        assert_equal(worker.is_worker, True)
+        assert_equal(worker.spool_dir, plugin.spool_dir)
+    finally:
+        shutil.rmtree(plugin.spool_dir)
+
+
+def test_sphinx_doc_plugin__collect_tests():
+    """
+    Test :py:meth:`.SphinxDocPlugin.collectTests` with nested suites.
+    """
+    plugin = SphinxDocPlugin()
+    plugin.storeTest = Mock()
+    test1 = _get_test_case_mock()
+    test2 = _get_function_test_case_mock()
+    failure = Mock(nose.case.Test)
+    failure.test = Mock(nose.failure.Failure)
+    plugin.collectTests(unittest.TestSuite([
+        unittest.TestSuite([test1, failure]),
+        unittest.TestSuite([]),
+        test2]))
+    assert_equal(plugin.storeTest.call_args_list,
+        [((test1,), {}), ((test2,), {})])
+
+
+def test_sphinx_doc_plugin__prepare_test__doc_only():
+    """
+    Test :py:meth:`.SphinxDocPlugin.prepareTest` in documentation only mode.
+    """
+    plugin = SphinxDocPlugin()
+    plugin.collectTests = Mock()
+    plugin.generateDoc = Mock()
+    suite = unittest.TestSuite()
+    assert_equal(plugin.prepareTest(suite), None)
+    assert_equal(plugin.collectTests.call_count, 0)
+
+    plugin.doc_only = True
+    replacement = plugin.prepareTest(suite)
+    assert_equal(replacement.countTestCases(), 0)
+    assert_equal(plugin.collectTests.call_args, ((suite,), {}))
+    assert_equal(plugin.generateDoc.call_count, 1)
+
+
+def test_sphinx_doc_plugin__load_tests_from_names__ast():
+    """
+    Test ast discovery does not let nose loader import test modules.
+    """
+    import nose.config
+    import nose.loader
+    import nose.plugins.manager
+    dirname = tempfile.mkdtemp()
+    try:
+        package = os.path.join(dirname, 'nsd_pkg')
+        os.makedirs(package)
+        open(os.path.join(package, '__init__.py'), 'w').close()
+        source_file = open(os.path.join(package, 'test_c.py'), 'w')
+        source_file.write('raise RuntimeError("imported")\n'
+                          'def test_me():\n'
+                          '    pass\n')
+        source_file.close()
+        plugin = SphinxDocPlugin()
+        plugin.discovery = 'ast'
+        plugin.doc_only = True
+        plugin.generateDoc = Mock()
+        conf = nose.config.Config(workingDir=dirname,
+            plugins=nose.plugins.manager.PluginManager(plugins=[plugin]))
+        plugin.conf = conf
+        loader = nose.loader.TestLoader(config=conf)
+        #suites are not run here, plain ones are enough
+        loader.suiteClass = unittest.TestSuite
+        for name in ['nsd_pkg', os.path.join('nsd_pkg', 'test_c.py')]:
+            plugin.test_dict = {}
+            plugin.test_nodes = {}
+            suite = loader.loadTestsFromNames([name])
+            assert_equal(plugin.test_names, [name])
+            plugin.prepareTest(suite)
+            assert_equal([test_info.fullName()
+                          for test_info in plugin._iterTests(plugin.test_dict)],
+                         ['nsd_pkg.test_c.test_me'])
+        assert_equal('nsd_pkg.test_c' in sys.modules, False)
+        #with default discovery nose loads tests as usual
+        plugin.discovery = 'nose'
+        assert_equal(plugin.loadTestsFromNames(['nsd_pkg']), None)
+    finally:
+        sys.modules.pop('nsd_pkg', None)
+        shutil.rmtree(dirname)
+
+
+def test_sphinx_doc_plugin__want_file__cached():
+    """
+    Test :py:meth:`.SphinxDocPlugin.wantFile` skips unchanged cached modules.
+    """
+    plugin = SphinxDocPlugin()
+    dirname = tempfile.mkdtemp()
+    try:
+        fname = _make_module(dirname, 'nsd_wanted_module')
+        test_info = _get_function_test_case_info_mock()
+        test_info.module = 'nsd_wanted_module'
+        manifest_name = os.path.join(dirname, 'manifest.json')
+        plugin.saveManifest(plugin.updateManifest({},
+            {'nsd_wanted_module': {'__tests__': [test_info]}}), manifest_name)
+
+        plugin.doc_only = True
+        plugin.use_cache = True
+        plugin.doc_dir_name = dirname
+        with patch('nose_sphinx_doc.MANIFEST_FILE', 'manifest.json'):
+            plugin.begin()
+        assert_equal(plugin.wantFile(fname), False)
+        assert_equal(plugin.wantFile(os.path.join(dirname, 'other.py')), None)
+        source_file = open(fname, 'a')
+        source_file.write('# changed\n')
+        source_file.close()
+        assert_equal(plugin.wantFile(fname), None)
+    finally:
+        del sys.modules['nsd_wanted_module']
+        shutil.rmtree(dirname)
+
+
+def test_sphinx_doc_plugin___static_doc():
+    """
+    Test capturing of documentation by :py:meth:`.SphinxDocPlugin._staticDoc`.
+    """
+    class SampleTest(unittest.TestCase):
+        """
+        Sample.
+        """
+        def test_me(self, a, b=1):
+            """Test me."""
+
+        def test_undocumented(self):
+            pass
+
+        @staticmethod
+        def test_static(a):
+            """Static."""
+
+        def _private(self):
+            """Private."""
+
+    def test_function(x, *args, **kwargs):
+        """
+        Function.
+
+        More.
+        """
+    plugin = SphinxDocPlugin()
+    assert_equal(plugin._staticDoc(test_function),
+        ('(x, *args, **kwargs)', 'Function.\n\nMore.', ()))
+    expected = (None, 'Sample.', (
+        ('test_me', '(a, b=1)', 'Test me.'),
+        ('test_static', '(a)', 'Static.')))
+    assert_equal(plugin._staticDoc(SampleTest), expected)
+    #documentation of a class is shared by its tests
+    assert_equal(plugin._staticDoc(SampleTest) is
+        plugin._staticDoc(SampleTest), True)
+
+
+def test_sphinx_doc_plugin___document_static():
+    """
+    Test rendering of captured documentation.
+    """
+    plugin = SphinxDocPlugin()
+    plugin.static_doc = True
+    test_info = _get_test_case_info_mock()
+    test_info.doc = (None, 'Sample.\n\nMore.',
+        (('test_me', '(a)', 'Test me.'),))
+    expected = ('    .. py:class:: module.test_me\n\n'
+        '        Sample.\n\n'
+        '        More.\n\n'
+        '        .. py:method:: test_me(a)\n\n'
+        '            Test me.\n\n')
+    assert_equal(plugin._document_test_case(test_info), expected)
+
+    test_info = _get_function_test_case_info_mock()
+    test_info.doc = ('()', None, ())
+    expected = '    .. py:function:: module.test_me()\n\n'
+    assert_equal(plugin._document_function_test_case(test_info), expected)
+
+    #without static documentation autodoc is used
+    plugin.static_doc = False
+    expected = '    .. autofunction:: module.test_me\n\n'
+    assert_equal(plugin._document_function_test_case(test_info), expected)
+
+
+def _get_ast_collector(**kwargs):
+    """
+    Return :py:class:`AstCollector` using default nose selection rules.
+    """
+    return AstCollector(re.compile(r'(?:^|[\b_\./-])[Tt]est'),
+        ignore_files=[re.compile(r'^\.'), re.compile(r'^_'),
+                      re.compile(r'^setup\.py$')], **kwargs)
+
+
+def test_ast_collector__collect_file():
+    """
+    Test :py:meth:`.AstCollector.collectFile` for test classes and functions.
+    """
+    dirname = tempfile.mkdtemp()
+    try:
+        fname = os.path.join(dirname, 'test_sample.py')
+        source_file = open(fname, 'w')
+        source_file.write(
+            'import unittest\n'
+            'class Base(unittest.TestCase):\n'
+            '    def test_b(self):\n'
+            '        pass\n'
+            '    @property\n'
+            '    def test_a(self):\n'
+            '        pass\n'
+            '    def helper(self):\n'
+            '        pass\n'
+            'class Derived(Base):\n'
+            '    __test__ = False\n'
+            'def test_z():\n'
+            '    pass\n'
+            'def _test_private():\n'
+            '    pass\n'
+            'def test_y():\n'
+            '    """\n'
+            '    >>> 1\n'
+            '    1\n'
+            '    """\n')
+        source_file.close()
+        fname = os.path.abspath(fname)
+        collector = _get_ast_collector()
+        assert_equal(collector.collectFile(fname), [
+            CollectedTest('test_sample', 'Base', 'TestCase', lineno=5,
+                method='test_a', file=fname),
+            CollectedTest('test_sample', 'Base', 'TestCase', lineno=3,
+                method='test_b', file=fname),
+            CollectedTest('test_sample', 'test_z', 'FunctionTestCase',
+                lineno=12, file=fname),
+            CollectedTest('test_sample', 'test_y', 'FunctionTestCase',
+                lineno=16, file=fname),
+        ])
+        #doctests in test modules are collected only with doctest_tests
+        collector = _get_ast_collector(doctests=True, doctest_tests=True)
+        assert_equal(collector.collectFile(fname, is_test=False), [
+            CollectedTest('test_sample', 'test_y', 'DocTestCase', lineno=16,
+                source='\n    >>> 1\n    1\n    ', file=fname),
+        ])
+        collector = _get_ast_collector(doctests=True)
+        assert_equal(collector.collectFile(fname, is_test=False), [])
+    finally:
+        shutil.rmtree(dirname)
+
+
+def test_ast_collector__collect_file__inherited():
+    """
+    Test :py:meth:`.AstCollector.collectFile` finds test methods inherited
+    from classes in the same module.
+    """
+    dirname = tempfile.mkdtemp()
+    try:
+        fname = os.path.join(dirname, 'test_inherited.py')
+        source_file = open(fname, 'w')
+        source_file.write(
+            'from unittest import TestCase\n'
+            'class Mixin(object):\n'
+            '    def test_mixin(self):\n'
+            '        pass\n'
+            'class Base(TestCase):\n'
+            '    def test_base(self):\n'
+            '        pass\n'
+            'class Derived(Base):\n'
+            '    def test_base(self):\n'
+            '        pass\n'
+            'class UsesMixin(Mixin, TestCase):\n'
+            '    pass\n')
+        source_file.close()
+        fname = os.path.abspath(fname)
+        assert_equal(_get_ast_collector().collectFile(fname), [
+            CollectedTest('test_inherited', 'Base', 'TestCase', lineno=6,
+                method='test_base', file=fname),
+            CollectedTest('test_inherited', 'Derived', 'TestCase', lineno=9,
+                method='test_base', file=fname),
+            CollectedTest('test_inherited', 'UsesMixin', 'TestCase', lineno=3,
+                method='test_mixin', file=fname),
+        ])
+    finally:
+        shutil.rmtree(dirname)
+
+
+def test_ast_collector__iter_files():
+    """
+    Test :py:meth:`.AstCollector.iterFiles` selection of files.
+    """
+    dirname = tempfile.mkdtemp()
+    try:
+        for name in ['pkg/__init__.py', 'pkg/test_a.py', 'pkg/lib.py',
+                     'pkg/_test_private.py', 'pkg/tests/test_b.py',
+                     'other/test_c.py', 'src/test_d.py', 'setup.py']:
+            fname = os.path.join(dirname, name)
+            SphinxDocPlugin._makedirs(os.path.dirname(fname))
+            open(fname, 'w').close()
+
+        def found(collector):
+            return [(os.path.relpath(fname, dirname), is_test)
+                    for fname, is_test in collector.iterFiles(dirname)]
+        assert_equal(found(_get_ast_collector(src_dirs=['src'])), [
+            (os.path.join('pkg', 'test_a.py'), True),
+            (os.path.join('pkg', 'tests', 'test_b.py'), True),
+            (os.path.join('src', 'test_d.py'), True),
+        ])
+        assert_equal(found(_get_ast_collector(doctests=True)), [
+            (os.path.join('pkg', '__init__.py'), False),
+            (os.path.join('pkg', 'lib.py'), False),
+            (os.path.join('pkg', 'test_a.py'), True),
+            (os.path.join('pkg', 'tests', 'test_b.py'), True),
+        ])
+    finally:
+        shutil.rmtree(dirname)
+
+
+def test_ast_collector__static_doc():
+    """
+    Test capturing of documentation by :py:class:`.AstCollector`.
+    """
+    dirname = tempfile.mkdtemp()
+    try:
+        fname = os.path.join(dirname, 'test_static.py')
+        source_file = open(fname, 'w')
+        source_file.write(
+            'class SampleTest(TestCase):\n'
+            '    """\n'
+            '    Sample.\n'
+            '    """\n'
+            '    def test_me(self, a, b=1):\n'
+            '        """Test me."""\n'
+            '    @staticmethod\n'
+            '    def test_static(a):\n'
+            '        """Static."""\n'
+            'def test_function(x, *args, **kwargs):\n'
+            '    """Function."""\n')
+        source_file.close()
+        tests = _get_ast_collector(static_doc=True).collectFile(fname)
+        assert_equal([test.doc for test in tests], [
+            (None, 'Sample.', (
+                ('test_me', '(a, b=1)', 'Test me.'),
+                ('test_static', '(a)', 'Static.'))),
+            (None, 'Sample.', (
+                ('test_me', '(a, b=1)', 'Test me.'),
+                ('test_static', '(a)', 'Static.'))),
+            ('(x, *args, **kwargs)', 'Function.', ()),
+        ])
+    finally:
+        shutil.rmtree(dirname)
+
+
+def test_profiler__timed():
+    """
+    Test :py:meth:`.Profiler.timed` and reporting of slowest modules.
+    """
+    profiler = Profiler(slowest_count=2)
+    func = profiler.timed('render', lambda name: name.upper(),
+        key=lambda name: name)
+    assert_equal(func('a'), 'A')
+    func('b')
+    profiler.add('render', 10.0, 'slow')
+    profiler.add('render', 5.0, 'slower')
+    report = profiler.report()
+    assert_equal(report['calls'], {'render': 4})
+    assert_equal(report['phases']['render'] >= 15.0, True)
+    assert_equal(report['slowest_modules'], [
+        {'module': 'slow', 'time': 10.0},
+        {'module': 'slower', 'time': 5.0}])
+
+
+def test_sphinx_doc_plugin__generate_doc__profile():
+    """
+    Test :py:meth:`.SphinxDocPlugin.generateDoc` with profiling enabled.
+    """
+    plugin = SphinxDocPlugin()
+    plugin.enableProfiler()
+    dirname = tempfile.mkdtemp()
+    try:
+        plugin.doc_dir_name = dirname
+        plugin.json_file = os.path.join(dirname, 'tests.jsonl')
+        plugin.begin()
+        plugin.testToDict(plugin.test_dict, _get_function_test_case_info_mock())
+        plugin.generateDoc()
+        report = json.load(open(os.path.join(dirname,
+            'sphinx_doc_profile.json')))
+        assert_equal(report['tests'], 1)
+        assert_equal(report['pages'], 2)
+        assert_equal(report['calls']['render'], 2)
+        assert_equal(report['calls']['tree'], 1)
+        #streamed json inventory is counted as well
+        assert_equal(report['counters']['files_written'], 4)
+        assert_equal(report['counters']['bytes_written'],
+            sum(os.path.getsize(os.path.join(dirname, name))
+                for name in ['index.rst', os.path.join('module', 'index.rst'),
+                             '.generated_files', 'tests.jsonl']))
+        assert_equal(sorted(item['module']
+            for item in report['slowest_modules']), ['', 'module'])
+        #memory is not traced unless asked for
+        assert_equal(report['memory_traced'], False)
+        assert_equal(report['memory_peaks'], {})
+    finally:
+        shutil.rmtree(dirname)
+
+
+def test_sphinx_doc_plugin__generate_doc__profile_memory():
+    """
+    Test :py:meth:`.SphinxDocPlugin.generateDoc` with memory tracing enabled.
+    """
+    plugin = SphinxDocPlugin()
+    plugin.enableProfiler(trace_memory=True)
+    dirname = tempfile.mkdtemp()
+    try:
+        plugin.doc_dir_name = dirname
+        plugin.begin()
+        plugin.testToDict(plugin.test_dict, _get_function_test_case_info_mock())
+        plugin.generateDoc()
+        report = json.load(open(os.path.join(dirname,
+            'sphinx_doc_profile.json')))
+        assert_equal(report['memory_traced'], True)
+        if tracemalloc is not None:
+            assert_equal(sorted(report['memory_peaks']),
+                ['collection', 'generation'])
+            assert_equal(tracemalloc.is_tracing(), False)
+    finally:
+        shutil.rmtree(dirname)
+
 #def test_sphinx_doc_plugin___document_tests():
 #    """
 #    Test 